@@ -0,0 +1,344 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+
+import final
+from final import fitz, Image
+
+# Banco de pruebas sin interfaz: genera PDF y firmas sintéticas y mide las rutas principales
+# del editor. Los resultados se guardan en JSON y se pueden comparar con una línea base.
+
+BENCHMARK_RESULTS_FILE = "benchmark_results.json"
+DEFAULT_THRESHOLD = 0.25
+PAGE_SIZES = {"a4": (595, 842), "letter": (612, 792), "a3": (842, 1191)}
+# (nombre, contenido, páginas, tamaño)
+DOCUMENTS = [
+    ("text-20-a4", "text", 20, "a4"),
+    ("text-200-letter", "text", 200, "letter"),
+    ("scan-20-a4", "scan", 20, "a4"),
+    ("scan-5-a3", "scan", 5, "a3")
+]
+QUICK_DOCUMENTS = [
+    ("text-5-a4", "text", 5, "a4"),
+    ("scan-3-a4", "scan", 3, "a4")
+]
+SCAN_DPI = 150
+HIT_TEST_SIGNATURES = 200
+HIT_TEST_QUERIES = 20000
+PHOTO_FRAMES = 10
+
+
+def make_text_pdf(path, pages, size, seed=0):
+    rng = random.Random(seed)
+    words = ["firma", "contrato", "cláusula", "anexo", "fecha", "nombre", "documento", "página", "acuerdo", "parte"]
+    width, height = size
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((50, 60), f"Documento sintético - página {page_num + 1}", fontsize=16)
+        y = 90
+        while y < height - 50:
+            line = " ".join(rng.choice(words) for _ in range(12))
+            page.insert_text((50, y), line, fontsize=10)
+            y += 14
+        page.draw_rect(fitz.Rect(50, height - 140, 250, height - 60), color=(0, 0, 0), width=0.5)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def make_scan_image(size, dpi=SCAN_DPI, seed=0):
+    # Página escaneada: fondo gris claro con ruido y renglones oscuros
+    rng = random.Random(seed)
+    width = int(size[0] * dpi / 72)
+    height = int(size[1] * dpi / 72)
+    noise = Image.effect_noise((width, height), 12).point(lambda v: 235 + v // 16)
+    image = noise.convert("RGB")
+    ink = Image.new("L", (width, height), 255)
+    for y in range(int(dpi * 0.8), height - int(dpi * 0.8), int(dpi / 5)):
+        x = int(dpi * 0.7)
+        while x < width - dpi:
+            length = rng.randint(dpi // 6, dpi // 2)
+            ink.paste(rng.randint(20, 80), (x, y, min(x + length, width - dpi), y + max(2, dpi // 30)))
+            x += length + dpi // 10
+    image.paste((30, 30, 40), mask=ink.point(lambda v: 255 - v))
+    return image
+
+
+def make_scanned_pdf(path, pages, size, seed=0):
+    doc = fitz.open()
+    for page_num in range(pages):
+        img_buffer = io.BytesIO()
+        make_scan_image(size, seed=seed + page_num).save(img_buffer, format="JPEG", quality=75)
+        page = doc.new_page(width=size[0], height=size[1])
+        page.insert_image(page.rect, stream=img_buffer.getvalue())
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def make_signature_image(width=1200, height=400, seed=0):
+    # Trazo oscuro sobre papel blanco con algo de ruido, como una firma escaneada
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 8).point(lambda v: 240 + v // 16).convert("RGB")
+    stroke = Image.new("L", (width, height), 0)
+    x, y = width * 0.1, height * 0.5
+    for _ in range(400):
+        nx = min(width * 0.9, max(width * 0.1, x + rng.uniform(-20, 30)))
+        ny = min(height * 0.85, max(height * 0.15, y + rng.uniform(-40, 40)))
+        r = 3
+        for t in range(8):
+            px = x + (nx - x) * t / 8
+            py = y + (ny - y) * t / 8
+            stroke.paste(255, (int(px - r), int(py - r), int(px + r), int(py + r)))
+        x, y = nx, ny
+    image.paste((20, 20, 90), mask=stroke)
+    return image
+
+
+def measure(func, repeat):
+    # Devuelve la mediana y el mínimo de varias ejecuciones
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"seconds": round(statistics.median(times), 6), "min": round(min(times), 6), "runs": repeat}
+
+
+def ppm_photo(pix, photo=None):
+    # Sin pantalla: misma codificación PPM que final.pixmap_to_photo, sin crear la imagen de Tk
+    return pix.tobytes("ppm")
+
+
+def bench_display(doc, zoom, to_photo):
+    # Render de todas las páginas con final.render_page_entry, la ruta de PDFEditor.get_page_render,
+    # partiendo de una caché vacía
+    def render():
+        cache = final.PageRenderCache()
+        for page_num in range(len(doc)):
+            final.render_page_entry(doc, page_num, zoom, cache, to_photo)
+    return render
+
+
+def bench_cache_hits(doc, zoom, to_photo, hits=1000):
+    cache = final.PageRenderCache()
+    final.render_page_entry(doc, 0, zoom, cache, to_photo)
+
+    def render():
+        for _ in range(hits):
+            final.render_page_entry(doc, 0, zoom, cache, to_photo)
+    return render
+
+
+def bench_tiles(doc, zoom, to_photo, viewport=(1200, 800)):
+    # Mosaicos visibles de la primera página con la selección y el render de
+    # PDFEditor.update_visible_tiles, reutilizando las imágenes liberadas como el editor
+    page = doc[0]
+    rect = page.rect * fitz.Matrix(zoom, zoom)
+    page_size = (rect.irect.width, rect.irect.height)
+    free_photos = []
+
+    def render():
+        photos = [final.render_tile(page, zoom, tile, page_size, free_photos.pop() if free_photos else None,
+                                    to_photo)
+                  for tile in sorted(final.visible_tiles(page_size, 0, 0, *viewport))]
+        free_photos[:] = photos[:final.TILE_PHOTO_POOL]
+    return render
+
+
+def tk_root():
+    # Las pruebas que crean imágenes de Tk necesitan pantalla; sin ella se omiten
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.withdraw()
+        return root
+    except Exception:
+        return None
+
+
+def bench_photo_paths(doc, zoom=1.5, frames=PHOTO_FRAMES):
+    # Copia de un pixmap a Tk por el camino antiguo (PIL) y por el directo (PPM),
+    # creando una imagen nueva y reutilizando la anterior del mismo tamaño
+    from PIL import ImageTk
+    pix = doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    photos = []
+
+    def pil():
+        for _ in range(frames):
+            photos[:] = [ImageTk.PhotoImage(Image.frombytes("RGB", [pix.width, pix.height], pix.samples))]
+
+    def ppm():
+        for _ in range(frames):
+            photos[:] = [final.pixmap_to_photo(pix)]
+
+    def ppm_reuse():
+        photo = final.pixmap_to_photo(pix)
+        for _ in range(frames):
+            photo = final.pixmap_to_photo(pix, photo)
+    return {"pil": pil, "ppm": ppm, "ppm_reuse": ppm_reuse}
+
+
+def signature_placements(doc, name, every=2):
+    return {
+        page_num: [((72, doc[page_num].rect.height - 140, 222, doc[page_num].rect.height - 90), name)]
+        for page_num in range(0, len(doc), every)
+    }
+
+
+def run_benchmarks(work_dir, quick=False, repeat=3, log=print):
+    results = {}
+
+    def record(name, func, runs=repeat):
+        results[name] = measure(func, runs)
+        log(f"{name}: {results[name]['seconds'] * 1000:.2f} ms (mín. {results[name]['min'] * 1000:.2f} ms)")
+
+    signature = make_signature_image()
+    record("remove_background.1200x400", lambda: final.remove_background(signature))
+    record("remove_background.feather", lambda: final.remove_background(signature, feather=1.5))
+    clean_signature = final.remove_background(signature)
+    img_buffer = io.BytesIO()
+    clean_signature.save(img_buffer, format="PNG")
+    images = {"firma": img_buffer.getvalue()}
+
+    # Remuestreo de la firma al dibujarla, con la misma función que usa el editor
+    signature_data = {"name": "firma", "original_image": clean_signature}
+
+    def resize(fast):
+        scaler = final.SignatureScaler()
+        for width in range(120, 420, 20):
+            scaler.scale(signature_data, width, width // 3, fast)
+    record("draw_signature.resize_lanczos", lambda: resize(False))
+    record("draw_signature.resize_fast", lambda: resize(True))
+
+    rng = random.Random(1)
+    grid = final.SignatureGrid()
+    for _ in range(HIT_TEST_SIGNATURES):
+        grid.insert({"original_x": rng.uniform(0, 500), "original_y": rng.uniform(0, 750),
+                     "original_width": rng.uniform(60, 200), "original_height": rng.uniform(20, 80)})
+    queries = [(rng.uniform(0, 595), rng.uniform(0, 842)) for _ in range(HIT_TEST_QUERIES)]
+
+    def hit_test():
+        for x, y in queries:
+            grid.hit_test(x, y, 1.0, 5)
+    record(f"hit_test.{HIT_TEST_SIGNATURES}x{HIT_TEST_QUERIES}", hit_test)
+
+    root = tk_root()
+    if root is None:
+        log("Sin pantalla: se omiten las pruebas de imágenes de Tk y se mide solo la codificación PPM")
+    to_photo = final.pixmap_to_photo if root is not None else ppm_photo
+    for name, content, pages, size_name in (QUICK_DOCUMENTS if quick else DOCUMENTS):
+        pdf_path = os.path.join(work_dir, f"{name}.pdf")
+        if content == "scan":
+            make_scanned_pdf(pdf_path, pages, PAGE_SIZES[size_name])
+        else:
+            make_text_pdf(pdf_path, pages, PAGE_SIZES[size_name])
+        doc = fitz.open(pdf_path)
+        try:
+            for zoom in (1.0, 2.0):
+                record(f"display_page.{name}.zoom{zoom:g}", bench_display(doc, zoom, to_photo))
+            record(f"display_page.{name}.cache_hit", bench_cache_hits(doc, 1.0, to_photo))
+            record(f"display_page.{name}.tiles_zoom3", bench_tiles(doc, 3.0, to_photo))
+            if root is not None:
+                for path, func in bench_photo_paths(doc).items():
+                    record(f"photo.{name}.{path}", func)
+                saved = results[f"photo.{name}.pil"]["seconds"] - results[f"photo.{name}.ppm_reuse"]["seconds"]
+                log(f"photo.{name}: {saved * 1000 / PHOTO_FRAMES:.2f} ms ahorrados por fotograma")
+            placements = signature_placements(doc, "firma")
+        finally:
+            doc.close()
+
+        out_path = os.path.join(work_dir, f"{name}_firmado.pdf")
+        record(f"save_pdf.{name}.vector",
+               lambda: final.export_pdf(pdf_path, out_path, placements, images))
+        for codec in ("png", "jpeg"):
+            record(f"save_pdf.{name}.flatten_{codec}",
+                   lambda codec=codec: final.export_pdf(pdf_path, out_path, placements, images, flatten=True,
+                                                        workers=1, profile={"codec": codec, "dpi": 150}),
+                   runs=1 if not quick and pages > 50 else repeat)
+    if root is not None:
+        root.destroy()
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pymupdf": getattr(fitz, "VersionBind", None),
+        "pillow": Image.__version__,
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # Regresión: la mediana supera la de la línea base en más del umbral (relativo).
+    # La línea base puede fijar umbrales por prueba en "thresholds".
+    thresholds = baseline.get("thresholds", {})
+    rows = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get("results", {}).get(name)
+        if previous is None or not previous["seconds"]:
+            rows.append({"name": name, "status": "nuevo", "seconds": current["seconds"]})
+            continue
+        ratio = current["seconds"] / previous["seconds"]
+        limit = thresholds.get(name, threshold)
+        rows.append({
+            "name": name,
+            "status": "regresión" if ratio > 1 + limit else "ok",
+            "seconds": current["seconds"],
+            "baseline": previous["seconds"],
+            "ratio": round(ratio, 3),
+            "threshold": limit
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark", description="Banco de pruebas de rendimiento de ADOBO PEDF")
+    parser.add_argument("--output", default=BENCHMARK_RESULTS_FILE, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Aumento relativo permitido antes de marcar una regresión (0.25 = 25 %%)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="Documentos pequeños, para comprobar que todo funciona")
+    parser.add_argument("--keep", help="Carpeta donde conservar los PDF generados")
+    args = parser.parse_args(argv)
+
+    final.load_dependencies()
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        results = run_benchmarks(args.keep, args.quick, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory(prefix="adobo_bench_") as work_dir:
+            results = run_benchmarks(work_dir, args.quick, args.repeat)
+
+    report = {"environment": environment(), "results": results}
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline, args.threshold)
+        for row in report["comparison"]:
+            if row["status"] == "nuevo":
+                print(f"[nuevo] {row['name']}: {row['seconds'] * 1000:.2f} ms")
+            else:
+                print(f"[{row['status']}] {row['name']}: {row['seconds'] * 1000:.2f} ms frente a "
+                      f"{row['baseline'] * 1000:.2f} ms (x{row['ratio']}, límite x{1 + row['threshold']:.2f})")
+        if any(row["status"] == "regresión" for row in report["comparison"]):
+            status = 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,699 +1,3268 @@
-import fitz
-import tkinter as tk
-from tkinter import filedialog, ttk, messagebox
-from PIL import Image, ImageTk
-import os
-import io
-import time
-import json
-import shutil
-
-class SplashScreen:
-    def __init__(self, root, logo_path, duration=3000):
-        self.root = root
-        self.root.overrideredirect(True)
-        self.root.attributes("-topmost", True)
-        
-        try:
-            logo_img = Image.open(logo_path)
-            logo_img = logo_img.resize((400, 300), Image.Resampling.LANCZOS)
-            self.logo = ImageTk.PhotoImage(logo_img)
-        except Exception as e:
-            print(f"Error al cargar el logo: {e}")
-            self.logo = None
-        
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        x = (screen_width - 400) // 2
-        y = (screen_height - 300) // 2
-        self.root.geometry(f"400x300+{x}+{y}")
-        
-        self.canvas = tk.Canvas(self.root, width=400, height=300, bg="white")
-        self.canvas.pack(fill=tk.BOTH, expand=True)
-        if self.logo:
-            self.canvas.create_image(200, 150, image=self.logo)
-        
-        self.root.after(duration, self.close_splash)
-    
-    def close_splash(self):
-        self.root.destroy()
-
-class PDFEditor:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("ADOBO PEDF")
-        self.root.geometry("1200x800")
-        
-        try:
-            logo_icon = Image.open(r"C:/Users/jnoh/Downloads/pdf felipe/pdf-felipe/logo/logo_adobo.png")
-            logo_icon = logo_icon.resize((32, 32), Image.Resampling.LANCZOS)
-            self.icon = ImageTk.PhotoImage(logo_icon)
-            self.root.iconphoto(True, self.icon)
-        except Exception as e:
-            print(f"Error al cargar el ícono: {e}")
-        
-        # Directorio para almacenar firmas
-        self.signatures_dir = "signatures"
-        if not os.path.exists(self.signatures_dir):
-            os.makedirs(self.signatures_dir)
-        
-        self.signatures_json = "signatures.json"
-        self.pdf_path = None
-        self.pdf_document = None
-        self.current_page = 0
-        self.total_pages = 0
-        self.page_image = None
-        self.tk_image = None
-        self.zoom_level = 1.0
-        
-        self.signatures = {}
-        self.available_signatures = []
-        self.selected_signature = None
-        self.selected_available_signature = None
-        self.drag_data = {"x": 0, "y": 0, "item": None, "dragging": False}
-        self.resize_data = {"active": False, "corner": None, "start_x": 0, "start_y": 0}
-        self.stored_signature = None
-        
-        # Estilo
-        self.style = ttk.Style()
-        self.style.configure('TButton', padding=5, font=('Arial', 10))
-        self.style.configure('TLabel', font=('Arial', 10))
-        
-        # Barra superior con todos los botones
-        self.top_bar = ttk.Frame(self.root, relief=tk.RAISED, borderwidth=1)
-        self.top_bar.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
-        
-        # Botones de herramientas
-        self.load_button = ttk.Button(self.top_bar, text="Cargar PDF", command=self.load_pdf)
-        self.load_button.pack(side=tk.LEFT, padx=5)
-        
-        self.upload_button = ttk.Button(self.top_bar, text="Subir Firma", command=self.upload_signature)
-        self.upload_button.pack(side=tk.LEFT, padx=5)
-        
-        self.signature_select_combobox = ttk.Combobox(self.top_bar, state="readonly", width=15)
-        self.signature_select_combobox.pack(side=tk.LEFT, padx=5)
-        self.signature_select_combobox.bind("<<ComboboxSelected>>", self.on_signature_select_to_add)
-        
-        self.delete_button = ttk.Button(self.top_bar, text="Eliminar Firma Disponible", command=self.delete_available_signature)
-        self.delete_button.pack(side=tk.LEFT, padx=5)
-        
-        self.save_button = ttk.Button(self.top_bar, text="Guardar PDF", command=self.save_pdf)
-        self.save_button.pack(side=tk.LEFT, padx=5)
-        
-        # Botones de navegación
-        self.prev_button = ttk.Button(self.top_bar, text="◄", command=self.prev_page, width=3)
-        self.prev_button.pack(side=tk.LEFT, padx=5)
-        
-        self.page_label = ttk.Label(self.top_bar, text="Página: 0/0")
-        self.page_label.pack(side=tk.LEFT, padx=5)
-        
-        self.next_button = ttk.Button(self.top_bar, text="►", command=self.next_page, width=3)
-        self.next_button.pack(side=tk.LEFT, padx=5)
-        
-        # Botones de zoom
-        self.zoom_in_button = ttk.Button(self.top_bar, text="+", command=lambda: self.adjust_zoom(1.2), width=3)
-        self.zoom_in_button.pack(side=tk.LEFT, padx=5)
-        
-        self.zoom_out_button = ttk.Button(self.top_bar, text="-", command=lambda: self.adjust_zoom(0.8), width=3)
-        self.zoom_out_button.pack(side=tk.LEFT, padx=5)
-        
-        self.zoom_reset_button = ttk.Button(self.top_bar, text="100%", command=self.reset_zoom, width=5)
-        self.zoom_reset_button.pack(side=tk.LEFT, padx=5)
-        
-        # Llamar a load_available_signatures después de crear el Combobox
-        self.load_available_signatures()
-        
-        # Área de visualización del PDF (ocupa todo el espacio)
-        self.viewer_frame = ttk.Frame(self.root)
-        self.viewer_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.canvas = tk.Canvas(self.viewer_frame, bg="gray")
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.v_scroll = ttk.Scrollbar(self.viewer_frame, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.h_scroll = ttk.Scrollbar(self.viewer_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
-        self.h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
-        self.canvas.configure(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
-        
-        # Vincular eventos
-        self.canvas.bind("<Button-1>", self.on_canvas_click)
-        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
-        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
-        self.canvas.bind("<Motion>", self.on_mouse_move)
-        self.canvas.bind("<Button-3>", self.on_canvas_right_click)
-        self.canvas.bind("<Configure>", self.on_canvas_resize)
-        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
-        
-        # Vincular el evento de cierre
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
-    def on_closing(self):
-        if not self.pdf_document:
-            self.root.destroy()
-            return
-
-        response = messagebox.askyesnocancel(
-            "Guardar cambios",
-            "¿Deseas guardar los cambios antes de cerrar?",
-            icon="question"
-        )
-
-        if response is True:  # Sí
-            self.save_pdf()
-            if self.pdf_document:
-                self.root.destroy()
-        elif response is False:  # No
-            self.root.destroy()
-        # Si response es None, significa que se seleccionó "Cancelar", así que no hacemos nada
-    
-    def load_available_signatures(self):
-        if not os.path.exists(self.signatures_json):
-            return
-        try:
-            with open(self.signatures_json, "r") as f:
-                signatures_data = json.load(f)
-            for sig_data in signatures_data:
-                image_path = sig_data["image_path"]
-                if os.path.exists(image_path):
-                    signature_img = Image.open(image_path)
-                    if signature_img.mode != 'RGBA':
-                        signature_img = signature_img.convert('RGBA')
-                    self.available_signatures.append({
-                        "name": sig_data["name"],
-                        "image": signature_img
-                    })
-            self.update_signature_select_combobox()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron cargar las firmas:\n{str(e)}")
-    
-    def load_pdf(self):
-        file_path = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
-        if not file_path:
-            messagebox.showwarning("Advertencia", "No se seleccionó ningún archivo PDF.")
-            return
-        try:
-            self.pdf_path = file_path
-            self.pdf_document = fitz.open(self.pdf_path)
-            self.total_pages = len(self.pdf_document)
-            self.current_page = 0
-            self.signatures = {i: [] for i in range(self.total_pages)}
-            self.update_page_label()
-            self.root.after(100, self.display_page)
-            messagebox.showinfo("Éxito", f"PDF cargado correctamente: {os.path.basename(file_path)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar el PDF:\n{str(e)}")
-    
-    def display_page(self):
-        if not self.pdf_document:
-            return
-        self.canvas.delete("all")
-        try:
-            page = self.pdf_document[self.current_page]
-            zoom_matrix = fitz.Matrix(self.zoom_level, self.zoom_level)
-            pix = page.get_pixmap(matrix=zoom_matrix)
-            self.page_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            self.tk_image = ImageTk.PhotoImage(self.page_image)
-            
-            img_width = pix.width
-            img_height = pix.height
-            canvas_width = self.canvas.winfo_width() or 700
-            canvas_height = self.canvas.winfo_height() or 800
-            x_offset = (canvas_width - img_width) / 2 if canvas_width > img_width else 0
-            y_offset = (canvas_height - img_height) / 2 if canvas_height > img_height else 0
-            self.canvas.config(scrollregion=(0, 0, img_width, img_height))
-            self.canvas.create_image(x_offset, y_offset, anchor=tk.NW, image=self.tk_image)
-            self.restore_signatures()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al mostrar la página:\n{str(e)}")
-    
-    def upload_signature(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.bmp")])
-        if not file_path:
-            messagebox.showwarning("Advertencia", "No se seleccionó ninguna imagen de firma.")
-            return
-        try:
-            signature_img = Image.open(file_path)
-            if signature_img.mode != 'RGBA':
-                signature_img = signature_img.convert('RGBA')
-            
-            datas = signature_img.getdata()
-            new_data = []
-            for item in datas:
-                if item[0] > 200 and item[1] > 200 and item[2] > 200:
-                    new_data.append((255, 255, 255, 0))
-                else:
-                    new_data.append(item)
-            signature_img.putdata(new_data)
-            
-            signature_name = os.path.basename(file_path)
-            signature_path = os.path.join(self.signatures_dir, signature_name)
-            signature_img.save(signature_path, format="PNG")
-            
-            new_signature = {
-                "name": signature_name,
-                "image": signature_img
-            }
-            self.available_signatures.append(new_signature)
-            
-            signatures_data = [
-                {"name": sig["name"], "image_path": os.path.join(self.signatures_dir, sig["name"])}
-                for sig in self.available_signatures
-            ]
-            with open(self.signatures_json, "w") as f:
-                json.dump(signatures_data, f, indent=4)
-            
-            self.update_signature_select_combobox()
-            messagebox.showinfo("Éxito", f"Firma '{signature_name}' añadida correctamente.")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo subir la firma:\n{str(e)}")
-    
-    def delete_available_signature(self):
-        selected_index = self.signature_select_combobox.current()
-        if selected_index < 0:
-            messagebox.showwarning("Advertencia", "No hay firma seleccionada para eliminar.")
-            return
-        try:
-            signature_name = self.available_signatures[selected_index]["name"]
-            signature_path = os.path.join(self.signatures_dir, signature_name)
-            if os.path.exists(signature_path):
-                os.remove(signature_path)
-            
-            del self.available_signatures[selected_index]
-            
-            signatures_data = [
-                {"name": sig["name"], "image_path": os.path.join(self.signatures_dir, sig["name"])}
-                for sig in self.available_signatures
-            ]
-            with open(self.signatures_json, "w") as f:
-                json.dump(signatures_data, f, indent=4)
-            
-            self.update_signature_select_combobox()
-            messagebox.showinfo("Éxito", "Firma eliminada de las disponibles correctamente.")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo eliminar la firma:\n{str(e)}")
-    
-    def draw_signature(self, signature_data):
-        if not signature_data or not self.page_image:
-            return
-        
-        scaled_width = int(signature_data["original_width"] * self.zoom_level)
-        scaled_height = int(signature_data["original_height"] * self.zoom_level)
-        scaled_image = signature_data["original_image"].resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
-        tk_signature = ImageTk.PhotoImage(scaled_image)
-        
-        canvas_width = self.canvas.winfo_width() or 700
-        canvas_height = self.canvas.winfo_height() or 800
-        img_width = self.page_image.width
-        img_height = self.page_image.height
-        x_offset = (canvas_width - img_width) / 2 if canvas_width > img_width else 0
-        y_offset = (canvas_height - img_height) / 2 if canvas_height > img_height else 0
-        
-        x = signature_data["original_x"] * self.zoom_level + x_offset
-        y = signature_data["original_y"] * self.zoom_level + y_offset
-        
-        signature_data["tk_image"] = tk_signature
-        signature_id = self.canvas.create_image(x, y, anchor=tk.NW, image=tk_signature, tags="signature")
-        box_id = self.canvas.create_rectangle(
-            x, y, x + scaled_width, y + scaled_height,
-            outline="red", dash=(5, 2), width=2, tags="signature_box"
-        )
-        dot_id = self.canvas.create_oval(
-            x - 5, y + scaled_height - 5, x + 5, y + scaled_height + 5,
-            fill="blue", tags="signature_dot"
-        )
-        signature_data["canvas_items"] = {"signature": signature_id, "box": box_id, "dot": dot_id}
-    
-    def restore_signatures(self):
-        for signature in self.signatures.get(self.current_page, []):
-            self.draw_signature(signature)
-    
-    def update_signature_select_combobox(self):
-        self.signature_select_combobox["values"] = [sig["name"] for sig in self.available_signatures]
-        if self.available_signatures:
-            self.signature_select_combobox.current(0)
-    
-    def on_signature_select_to_add(self, event):
-        selected_index = self.signature_select_combobox.current()
-        if selected_index >= 0:
-            self.selected_available_signature = self.available_signatures[selected_index]
-            messagebox.showinfo("Instrucción", "Haz clic en el lienzo para insertar la firma.")
-    
-    def select_signature(self, signature_index):
-        for sig in self.signatures.get(self.current_page, []):
-            if "box" in sig.get("canvas_items", {}):
-                self.canvas.itemconfig(sig["canvas_items"]["box"], outline="red")
-        
-        if signature_index is not None and 0 <= signature_index < len(self.signatures.get(self.current_page, [])):
-            self.selected_signature = signature_index
-            if "box" in self.signatures[self.current_page][signature_index].get("canvas_items", {}):
-                self.canvas.itemconfig(self.signatures[self.current_page][signature_index]["canvas_items"]["box"], outline="blue")
-        else:
-            self.selected_signature = None
-    
-    def insert_signature_at(self, x, y):
-        if self.selected_available_signature:
-            try:
-                signature_img = self.selected_available_signature["image"]
-                base_width = 150
-                w_percent = (base_width / float(signature_img.size[0]))
-                h_size = int((float(signature_img.size[1]) * float(w_percent)))
-                
-                signature_data = {
-                    "original_image": signature_img,
-                    "original_x": x,
-                    "original_y": y,
-                    "original_width": base_width,
-                    "original_height": h_size,
-                    "canvas_items": {}
-                }
-                if self.current_page not in self.signatures:
-                    self.signatures[self.current_page] = []
-                self.signatures[self.current_page].append(signature_data)
-                self.draw_signature(signature_data)
-                self.selected_available_signature = None
-                messagebox.showinfo("Éxito", "Firma insertada correctamente.")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo insertar la firma:\n{str(e)}")
-    
-    def on_mouse_move(self, event):
-        if not self.signatures.get(self.current_page):
-            self.canvas.config(cursor="arrow")
-            return
-        
-        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        for i, signature in enumerate(self.signatures.get(self.current_page, [])):
-            sig_x = signature["original_x"] * self.zoom_level + (self.canvas.winfo_width() - self.page_image.width) / 2
-            sig_y = signature["original_y"] * self.zoom_level + (self.canvas.winfo_height() - self.page_image.height) / 2
-            sig_width = signature["original_width"] * self.zoom_level
-            sig_height = signature["original_height"] * self.zoom_level
-            
-            corners = {
-                "nw": (sig_x, sig_y, sig_x + 10, sig_y + 10),
-                "ne": (sig_x + sig_width - 10, sig_y, sig_x + sig_width, sig_y + 10),
-                "sw": (sig_x, sig_y + sig_height - 10, sig_x + 10, sig_y + sig_height),
-                "se": (sig_x + sig_width - 10, sig_y + sig_height - 10, sig_x + sig_width, sig_y + sig_height),
-                "dot": (sig_x - 5, sig_y + sig_height - 5, sig_x + 5, sig_y + sig_height + 5)
-            }
-            
-            for corner, (x1, y1, x2, y2) in corners.items():
-                if x1 <= x <= x2 and y1 <= y <= y2:
-                    if corner == "dot":
-                        self.canvas.config(cursor="size_nw_se")
-                    else:
-                        self.canvas.config(cursor="size_" + corner)
-                    return
-            
-            if sig_x <= x <= sig_x + sig_width and sig_y <= y <= sig_y + sig_height:
-                self.canvas.config(cursor="fleur")
-                return
-        
-        self.canvas.config(cursor="arrow")
-    
-    def on_canvas_click(self, event):
-        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        canvas_width = self.canvas.winfo_width() or 700
-        canvas_height = self.canvas.winfo_height() or 800
-        img_width = self.page_image.width if self.page_image else 0
-        img_height = self.page_image.height if self.page_image else 0
-        x_offset = (canvas_width - img_width) / 2 if canvas_width > img_width else 0
-        y_offset = (canvas_height - img_height) / 2 if canvas_height > img_height else 0
-        
-        if self.selected_available_signature and self.page_image:
-            canvas_x = (x - x_offset) / self.zoom_level
-            canvas_y = (y - y_offset) / self.zoom_level
-            self.insert_signature_at(canvas_x, canvas_y)
-            return
-        
-        clicked_items = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
-        if not clicked_items:
-            self.select_signature(None)
-            return
-        
-        for i, signature in enumerate(self.signatures.get(self.current_page, [])):
-            sig_x = signature["original_x"] * self.zoom_level + x_offset
-            sig_y = signature["original_y"] * self.zoom_level + y_offset
-            sig_width = signature["original_width"] * self.zoom_level
-            sig_height = signature["original_height"] * self.zoom_level
-            
-            corners = {
-                "nw": (sig_x, sig_y, sig_x + 10, sig_y + 10),
-                "ne": (sig_x + sig_width - 10, sig_y, sig_x + sig_width, sig_y + 10),
-                "sw": (sig_x, sig_y + sig_height - 10, sig_x + 10, sig_y + sig_height),
-                "se": (sig_x + sig_width - 10, sig_y + sig_height - 10, sig_x + sig_width, sig_y + sig_height),
-                "dot": (sig_x - 5, sig_y + sig_height - 5, sig_x + 5, sig_y + sig_height + 5)
-            }
-            
-            for corner, (x1, y1, x2, y2) in corners.items():
-                if x1 <= x <= x2 and y1 <= y <= y2:
-                    self.select_signature(i)
-                    self.resize_data = {
-                        "active": True,
-                        "corner": "sw" if corner == "dot" else corner,
-                        "start_x": (x - x_offset) / self.zoom_level,
-                        "start_y": (y - y_offset) / self.zoom_level,
-                        "start_width": signature["original_width"],
-                        "start_height": signature["original_height"]
-                    }
-                    return
-            
-            if (signature.get("canvas_items", {}).get("signature") in clicked_items or 
-                signature.get("canvas_items", {}).get("box") in clicked_items):
-                self.select_signature(i)
-                self.drag_data = {
-                    "x": (x - x_offset) / self.zoom_level,
-                    "y": (y - y_offset) / self.zoom_level,
-                    "item": i,
-                    "start_x": signature["original_x"],
-                    "start_y": signature["original_y"],
-                    "dragging": False
-                }
-                return
-    
-    def on_canvas_drag(self, event):
-        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        canvas_width = self.canvas.winfo_width() or 700
-        canvas_height = self.canvas.winfo_height() or 800
-        img_width = self.page_image.width if self.page_image else 0
-        img_height = self.page_image.height if self.page_image else 0
-        x_offset = (canvas_width - img_width) / 2 if canvas_width > img_width else 0
-        y_offset = (canvas_height - img_height) / 2 if canvas_height > img_height else 0
-        canvas_x = (x - x_offset) / self.zoom_level
-        canvas_y = (y - y_offset) / self.zoom_level
-        
-        if self.resize_data["active"] and self.selected_signature is not None:
-            signature = self.signatures[self.current_page][self.selected_signature]
-            dx = canvas_x - self.resize_data["start_x"]
-            dy = canvas_y - self.resize_data["start_y"]
-            
-            if self.resize_data["corner"] == "nw":
-                new_width = self.resize_data["start_width"] - dx
-                new_height = self.resize_data["start_height"] - dy
-                new_x = self.resize_data["start_x"] + dx
-                new_y = self.resize_data["start_y"] + dy
-            elif self.resize_data["corner"] == "ne":
-                new_width = self.resize_data["start_width"] + dx
-                new_height = self.resize_data["start_height"] - dy
-                new_x = signature["original_x"]
-                new_y = self.resize_data["start_y"] + dy
-            elif self.resize_data["corner"] == "sw":
-                new_width = self.resize_data["start_width"] - dx
-                new_height = self.resize_data["start_height"] + dy
-                new_x = self.resize_data["start_x"] + dx
-                new_y = signature["original_y"]
-            elif self.resize_data["corner"] == "se":
-                new_width = self.resize_data["start_width"] + dx
-                new_height = self.resize_data["start_height"] + dy
-                new_x = signature["original_x"]
-                new_y = signature["original_y"]
-            
-            new_width = max(30, new_width)
-            new_height = max(30, new_height)
-            
-            if event.state & 0x1:  # Shift key pressed
-                aspect = signature["original_width"] / signature["original_height"]
-                new_height = new_width / aspect
-            
-            signature["original_width"] = new_width
-            signature["original_height"] = new_height
-            if self.resize_data["corner"] in ["nw", "sw"]:
-                signature["original_x"] = new_x
-            if self.resize_data["corner"] in ["nw", "ne"]:
-                signature["original_y"] = new_y
-            
-            self.redraw_signature(self.selected_signature)
-        
-        elif self.drag_data.get("item") is not None:
-            signature = self.signatures[self.current_page][self.drag_data["item"]]
-            dx = canvas_x - self.drag_data["x"]
-            dy = canvas_y - self.drag_data["y"]
-            
-            if abs(dx) > 5 or abs(dy) > 5:
-                self.drag_data["dragging"] = True
-            
-            if self.drag_data["dragging"]:
-                signature["original_x"] = self.drag_data["start_x"] + dx
-                signature["original_y"] = self.drag_data["start_y"] + dy
-                self.redraw_signature(self.drag_data["item"])
-    
-    def on_canvas_release(self, event):
-        self.resize_data["active"] = False
-        self.drag_data["item"] = None
-        self.drag_data["dragging"] = False
-    
-    def redraw_signature(self, signature_index):
-        if not (0 <= signature_index < len(self.signatures.get(self.current_page, []))):
-            return
-        signature = self.signatures[self.current_page][signature_index]
-        for item in signature.get("canvas_items", {}).values():
-            self.canvas.delete(item)
-        self.draw_signature(signature)
-    
-    def on_canvas_right_click(self, event):
-        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        clicked_items = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
-        if not clicked_items:
-            return
-        for i, signature in enumerate(self.signatures.get(self.current_page, [])):
-            if (signature.get("canvas_items", {}).get("signature") in clicked_items or 
-                signature.get("canvas_items", {}).get("box") in clicked_items):
-                self.selected_signature = i
-                self.delete_signature()
-                return
-    
-    def delete_signature(self):
-        if self.selected_signature is None:
-            messagebox.showwarning("Advertencia", "No hay firma seleccionada para eliminar.")
-            return
-        try:
-            for item in self.signatures[self.current_page][self.selected_signature]["canvas_items"].values():
-                self.canvas.delete(item)
-            del self.signatures[self.current_page][self.selected_signature]
-            self.selected_signature = None
-            self.display_page()
-            messagebox.showinfo("Éxito", "Firma eliminada correctamente.")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo eliminar la firma:\n{str(e)}")
-    
-    def save_pdf(self):
-        if not self.pdf_document:
-            messagebox.showwarning("Advertencia", "No hay documento PDF cargado.")
-            return
-
-        original_name = os.path.splitext(os.path.basename(self.pdf_path))[0]
-        save_path = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF Files", "*.pdf")],
-            initialfile=f"{original_name}_firma.pdf"
-        )
-        if not save_path:
-            return
-
-        try:
-            doc = fitz.open(self.pdf_path)
-            new_doc = fitz.open()
-
-            # Si no hay firmas, simplemente copiamos las páginas originales al nuevo documento
-            if not any(self.signatures.values()):
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                    img_buffer = io.BytesIO()
-                    img.save(img_buffer, format="PNG")
-                    img_bytes = img_buffer.getvalue()
-                    new_page.insert_image(new_page.rect, stream=img_bytes)
-            else:
-                # Si hay firmas, las insertamos y aplanamos las páginas
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    if page_num in self.signatures:
-                        for signature in self.signatures[page_num]:
-                            x1 = signature["original_x"]
-                            y1 = signature["original_y"]
-                            x2 = x1 + signature["original_width"]
-                            y2 = y1 + signature["original_height"]
-                            rect = fitz.Rect(x1, y1, x2, y2)
-                            img_buffer = io.BytesIO()
-                            signature["original_image"].save(img_buffer, format="PNG")
-                            img_bytes = img_buffer.getvalue()
-                            page.insert_image(rect, stream=img_bytes, keep_proportion=True)
-
-                    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
-                    img_buffer = io.BytesIO()
-                    img.save(img_buffer, format="PNG")
-                    img_bytes = img_buffer.getvalue()
-                    new_page.insert_image(new_page.rect, stream=img_bytes)
-
-            new_doc.save(save_path)
-            new_doc.close()
-            doc.close()
-            messagebox.showinfo("Éxito", f"PDF guardado correctamente en:\n{save_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo guardar el PDF:\n{str(e)}")
-    
-    def prev_page(self):
-        if self.pdf_document and self.current_page > 0:
-            self.current_page -= 1
-            self.canvas.yview_moveto(0)
-            self.display_page()
-            self.update_page_label()
-    
-    def next_page(self):
-        if self.pdf_document and self.current_page < self.total_pages - 1:
-            self.current_page += 1
-            self.canvas.yview_moveto(0)
-            self.display_page()
-            self.update_page_label()
-    
-    def update_page_label(self):
-        self.page_label.config(text=f"Página: {self.current_page + 1}/{self.total_pages}")
-    
-    def adjust_zoom(self, factor):
-        self.zoom_level *= factor
-        self.zoom_level = max(0.5, min(3.0, self.zoom_level))
-        self.display_page()
-    
-    def reset_zoom(self):
-        self.zoom_level = 1.0
-        self.display_page()
-    
-    def on_canvas_resize(self, event):
-        if self.page_image:
-            self.display_page()
-    
-    def on_mouse_wheel(self, event):
-        if event.state & 0x4:  # Control key pressed
-            factor = 1.1 if event.delta > 0 else 0.9
-            self.adjust_zoom(factor)
-            return "break"
-        else:
-            if self.page_image:
-                canvas_height = self.canvas.winfo_height()
-                page_height = self.page_image.height
-                if page_height <= canvas_height:
-                    if event.delta < 0 and self.current_page < self.total_pages - 1:
-                        self.next_page()
-                    elif event.delta > 0 and self.current_page > 0:
-                        self.prev_page()
-                else:
-                    self.canvas.yview_scroll(-1 * (event.delta // 120), "units")
-                    yview = self.canvas.yview()
-                    if yview[1] == 1.0 and event.delta < 0 and self.current_page < self.total_pages - 1:
-                        self.next_page()
-                    elif yview[0] == 0.0 and event.delta > 0 and self.current_page > 0:
-                        self.prev_page()
-            return "break"
-
-if __name__ == "__main__":
-    splash_root = tk.Tk()
-    logo_path = r"C:/Users/jnoh/Downloads/pdf felipe/pdf-felipe/logo/logo_adobo.png"
-    splash = SplashScreen(splash_root, logo_path, duration=3000)
-    splash_root.mainloop()
-    
-    root = tk.Tk()
-    app = PDFEditor(root)
-    root.mainloop()
-
+import time
+
+STARTUP_TIME = time.perf_counter()
+
+import tkinter as tk
+from tkinter import filedialog, ttk, messagebox
+import os
+import io
+import hashlib
+import importlib
+import sys
+import csv
+import json
+import shutil
+import sqlite3
+import argparse
+import base64
+import bisect
+import queue
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+
+class LazyModule:
+    # Importa el módulo en el primer acceso a uno de sus atributos
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+# Dependencias pesadas: se cargan en segundo plano mientras se muestra el splash
+fitz = LazyModule("fitz")
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+ImageChops = LazyModule("PIL.ImageChops")
+ImageFilter = LazyModule("PIL.ImageFilter")
+ImageStat = LazyModule("PIL.ImageStat")
+
+
+def load_dependencies():
+    for module in (fitz, Image, ImageTk, ImageChops, ImageFilter, ImageStat):
+        module.load()
+
+
+FLATTEN_DPI = 300
+DEFAULT_SIGNATURE_WIDTH = 150
+BACKGROUND_THRESHOLD = 200
+# Colores de la copia que se incrusta en el PDF: 0 = RGBA sin pérdida, 1 = tinta de un color + transparencia
+# y 2-256 = paleta con transparencia
+SIGNATURE_COLORS = 0
+# Margen transparente, en píxeles, que se conserva alrededor de la tinta al recortar
+SIGNATURE_CROP_MARGIN = 2
+SIGNATURE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+PAGE_CACHE_BUDGET = 256 * 1024 * 1024
+PREFETCH_DELAY = 150
+TILED_RENDER_PIXELS = 4000000
+TILE_SIZE = 512
+TILE_MARGIN = 1
+TILE_PHOTO_POOL = 16
+PREVIEW_ZOOM = 0.4
+REFINE_DELAY = 200
+FRAME_INTERVAL = 16
+MIP_MIN_SIZE = 32
+SCALED_SIGNATURE_CACHE = 256
+GRID_CELL_SIZE = 64
+# Las asas miden 10 px y el punto azul 5 px de radio en el lienzo: con el zoom mínimo (0.5)
+# sobresalen como mucho 10 puntos del rectángulo de la firma
+HANDLE_MARGIN = 10
+THUMBNAIL_SIZE = (96, 48)
+SIGNATURE_IMAGE_CACHE = 32
+LOGO_PATH = r"C:/Users/jnoh/Downloads/pdf felipe/pdf-felipe/logo/logo_adobo.png"
+STARTUP_TIMING_FILE = "startup_timing.json"
+# Con ADOBO_STARTUP_TIMING=1 se informa de los tiempos de arranque; con una ruta, se guardan ahí
+STARTUP_TIMING_ENV = "ADOBO_STARTUP_TIMING"
+THUMBNAIL_CACHE_DIR = os.path.join("cache", "thumbnails")
+PAGE_THUMB_WIDTH = 120
+PAGE_THUMB_HEIGHT = 160
+PAGE_THUMB_SLOT = 190
+TEXT_INDEX_CACHE_DIR = os.path.join("cache", "text_index")
+ANCHOR_POSITIONS = ("right", "left", "above", "below")
+ANCHOR_OFFSET = 5
+SERVICE_PORT = 8765
+SERVICE_QUEUE_SIZE = 8
+SERVICE_MAX_BODY = 256 * 1024 * 1024
+SERVICE_LATENCY_WINDOW = 1000
+CONTINUOUS_GAP = 12
+CONTINUOUS_BUFFER = 1
+# Páginas de salida que se acumulan en memoria antes de volcarlas a disco al exportar
+EXPORT_MAX_PAGES = 32
+# Segundos entre muestras de memoria residente durante una exportación
+MEMORY_SAMPLE_INTERVAL = 0.02
+EXPORT_CODECS = ("png", "jpeg", "gray", "bilevel")
+# dpi y códec solo afectan a las páginas aplanadas; el resto son opciones de escritura del PDF
+DEFAULT_EXPORT_PROFILE = {
+    "dpi": FLATTEN_DPI,
+    "codec": "png",
+    "jpeg_quality": 85,
+    "deflate": True,
+    "garbage": 3,
+    "object_streams": False,
+    # Añade las firmas como actualización incremental sobre una copia intacta del original
+    "incremental": False
+}
+EXPORT_PROFILE_FILE = "export_profile.json"
+
+
+def remove_background(image, threshold=BACKGROUND_THRESHOLD, feather=0):
+    # Vuelve transparente el fondo claro con operaciones por canal de Pillow:
+    # un píxel es fondo si sus tres canales superan el umbral
+    image = image.convert("RGBA")
+    r, g, b, alpha = image.split()
+    darkest = ImageChops.darker(ImageChops.darker(r, g), b)
+    ink = darkest.point(lambda v: 0 if v > threshold else 255)
+    image = Image.composite(image, Image.new("RGBA", image.size, (255, 255, 255, 0)), ink)
+    if feather > 0:
+        # Suaviza el borde de la tinta para evitar dientes de sierra
+        ink = ink.filter(ImageFilter.GaussianBlur(feather))
+    image.putalpha(ImageChops.multiply(alpha, ink))
+    return image
+
+
+def crop_to_ink(image, margin=SIGNATURE_CROP_MARGIN):
+    # Recorta los márgenes transparentes que deja remove_background
+    bbox = image.getchannel("A").getbbox()
+    if bbox is None:
+        raise ValueError("La imagen no contiene tinta: revisa el umbral de fondo")
+    left, top, right, bottom = bbox
+    return image.crop((max(0, left - margin), max(0, top - margin),
+                       min(image.width, right + margin), min(image.height, bottom + margin)))
+
+
+def encode_signature_blob(image, colors=SIGNATURE_COLORS):
+    # PNG listo para incrustar: se codifica una sola vez al importar y se guarda en la biblioteca
+    img_buffer = io.BytesIO()
+    if colors < 1:
+        image.save(img_buffer, format="PNG", optimize=True)
+        return img_buffer.getvalue()
+    # Con paleta, la transparencia es todo o nada: el canal alfa se umbraliza a la mitad y el
+    # fondo ocupa su propia entrada 0, totalmente transparente
+    alpha = image.getchannel("A")
+    mask = alpha.point(lambda v: 255 if v >= 128 else 0)
+    if mask.getbbox() is None:
+        # Tinta muy difuminada: se conserva todo lo que no es fondo
+        mask = alpha.point(lambda v: 255 if v else 0)
+    ink = tuple(int(round(v)) for v in ImageStat.Stat(image.convert("RGB"), mask).mean)
+    if colors == 1:
+        # Un bit de tinta con el color medio de los trazos
+        indexed = Image.new("P", image.size, 0)
+        indexed.putpalette([255, 255, 255] + list(ink))
+        indexed.paste(1, mask=mask)
+        indexed.save(img_buffer, format="PNG", transparency=0, bits=1, optimize=True)
+        return img_buffer.getvalue()
+    # Solo se cuantizan los colores de la tinta: el fondo se rellena con el color medio para
+    # que no gaste entradas de la paleta y el alfa no se mezcla con el color
+    rgb = Image.new("RGB", image.size, ink)
+    rgb.paste(image.convert("RGB"), mask=mask)
+    ink_colors = min(colors, 256) - 1
+    quantized = rgb.quantize(ink_colors, method=Image.Quantize.FASTOCTREE)
+    palette = quantized.getpalette()[:3 * ink_colors]
+    # Índices desplazados una posición para dejar la 0 al fondo transparente
+    shifted = Image.frombytes("L", image.size, quantized.tobytes()).point(lambda i: i + 1)
+    indexed = Image.frombytes("P", image.size, shifted.tobytes())
+    indexed.putpalette([255, 255, 255] + palette)
+    indexed.paste(0, mask=ImageChops.invert(mask))
+    indexed.save(img_buffer, format="PNG", transparency=0, optimize=True)
+    return img_buffer.getvalue()
+
+
+def build_mip_pyramid(image):
+    # Niveles a mitad de tamaño para escalar rápido mientras se redimensiona una firma
+    levels = [image]
+    while min(levels[-1].size) >= MIP_MIN_SIZE * 2:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+class SignatureScaler:
+    # Firmas remuestreadas para dibujarlas: LANCZOS con caché LRU por tamaño, o bilineal
+    # desde la pirámide de niveles mientras se arrastra el tirador
+    def __init__(self, cache_size=SCALED_SIGNATURE_CACHE):
+        self.cache_size = cache_size
+        self.pyramids = {}
+        self.scaled = OrderedDict()
+    
+    def invalidate(self, name):
+        self.pyramids.pop(name, None)
+        for key in [key for key in self.scaled if key[0] == name]:
+            del self.scaled[key]
+    
+    def scale(self, signature_data, width, height, fast=False):
+        name = signature_data["name"]
+        width = max(1, width)
+        height = max(1, height)
+        if fast:
+            # Parte del nivel más pequeño que aún sea mayor que el destino
+            pyramid = self.pyramids.get(name)
+            if pyramid is None:
+                pyramid = self.pyramids[name] = build_mip_pyramid(signature_data["original_image"])
+            source = pyramid[0]
+            for level in pyramid[1:]:
+                if level.width < width or level.height < height:
+                    break
+                source = level
+            return source.resize((width, height), Image.Resampling.BILINEAR)
+        
+        key = (name, width, height)
+        scaled_image = self.scaled.get(key)
+        if scaled_image is None:
+            scaled_image = signature_data["original_image"].resize((width, height), Image.Resampling.LANCZOS)
+            self.scaled[key] = scaled_image
+            if len(self.scaled) > self.cache_size:
+                self.scaled.popitem(last=False)
+        else:
+            self.scaled.move_to_end(key)
+        return scaled_image
+
+
+def signature_hit_region(signature, x, y, zoom, tolerance=0):
+    # Prueba de impacto en coordenadas de página; tolerance en píxeles del lienzo
+    sig_x = signature["original_x"]
+    sig_y = signature["original_y"]
+    sig_width = signature["original_width"]
+    sig_height = signature["original_height"]
+    handle = 10 / zoom
+    dot = 5 / zoom
+    corners = {
+        "nw": (sig_x, sig_y, sig_x + handle, sig_y + handle),
+        "ne": (sig_x + sig_width - handle, sig_y, sig_x + sig_width, sig_y + handle),
+        "sw": (sig_x, sig_y + sig_height - handle, sig_x + handle, sig_y + sig_height),
+        "se": (sig_x + sig_width - handle, sig_y + sig_height - handle, sig_x + sig_width, sig_y + sig_height),
+        "dot": (sig_x - dot, sig_y + sig_height - dot, sig_x + dot, sig_y + sig_height + dot)
+    }
+    for corner, (x1, y1, x2, y2) in corners.items():
+        if x1 <= x <= x2 and y1 <= y <= y2:
+            return corner
+    margin = tolerance / zoom
+    if sig_x - margin <= x <= sig_x + sig_width + margin and sig_y - margin <= y <= sig_y + sig_height + margin:
+        return "body"
+    return None
+
+
+class SignatureGrid:
+    # Índice espacial de una página: rejilla uniforme de celdas en coordenadas de página
+    def __init__(self, cell_size=GRID_CELL_SIZE, margin=HANDLE_MARGIN):
+        self.cell_size = cell_size
+        self.margin = margin
+        self.cells = {}
+        self.entries = {}
+        self.counter = 0
+    
+    def _cells_for(self, signature):
+        x1 = signature["original_x"] - self.margin
+        y1 = signature["original_y"] - self.margin
+        x2 = signature["original_x"] + signature["original_width"] + self.margin
+        y2 = signature["original_y"] + signature["original_height"] + self.margin
+        return [
+            (col, row)
+            for col in range(int(x1 // self.cell_size), int(x2 // self.cell_size) + 1)
+            for row in range(int(y1 // self.cell_size), int(y2 // self.cell_size) + 1)
+        ]
+    
+    def insert(self, signature):
+        # El orden de inserción conserva el orden de la lista de firmas de la página
+        self.counter += 1
+        cells = self._cells_for(signature)
+        self.entries[id(signature)] = (self.counter, signature, cells)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(id(signature))
+    
+    def remove(self, signature):
+        entry = self.entries.pop(id(signature), None)
+        if not entry:
+            return None
+        for cell in entry[2]:
+            members = self.cells[cell]
+            members.remove(id(signature))
+            if not members:
+                del self.cells[cell]
+        return entry[0]
+    
+    def update(self, signature):
+        order = self.remove(signature)
+        self.insert(signature)
+        if order is not None:
+            entry = self.entries[id(signature)]
+            self.entries[id(signature)] = (order, entry[1], entry[2])
+    
+    def query(self, x, y):
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        candidates = [self.entries[key] for key in self.cells.get(cell, ())]
+        return [signature for _, signature, _ in sorted(candidates, key=lambda entry: entry[0])]
+    
+    def hit_test(self, x, y, zoom, tolerance=0):
+        for signature in self.query(x, y):
+            region = signature_hit_region(signature, x, y, zoom, tolerance)
+            if region:
+                return signature, region
+        return None, None
+
+
+class PageRenderCache:
+    # LRU de páginas renderizadas con límite de memoria, por (página, zoom)
+    def __init__(self, budget=PAGE_CACHE_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+    
+    def put(self, key, entry):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)["cost"]
+        self.entries[key] = entry
+        self.size += entry["cost"]
+        while self.size > self.budget and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted["cost"]
+    
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+def pixmap_to_photo(pix, photo=None):
+    # Pasa el pixmap a Tk en un solo paso como datos PPM, sin pasar por PIL. Si se da una
+    # imagen de Tk del mismo tamaño se sobrescribe su contenido en lugar de crear otra.
+    data = pix.tobytes("ppm")
+    if photo is not None and photo.width() == pix.width and photo.height() == pix.height:
+        photo.configure(data=data, format="ppm")
+        return photo
+    return tk.PhotoImage(data=data, format="ppm")
+
+
+def render_page_entry(doc, page_num, zoom, cache, to_photo=pixmap_to_photo):
+    # Render de la página completa a través de la caché LRU. to_photo convierte el pixmap para
+    # el lienzo; el banco de pruebas lo sustituye por la codificación PPM cuando no hay pantalla
+    key = (page_num, round(zoom, 4))
+    entry = cache.get(key)
+    if entry is None:
+        pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        # Coste aproximado: pixmap RGB más la copia RGBA de Tk. El pixmap sirve de origen
+        # para las vistas previas a otro zoom.
+        entry = {"pixmap": pix, "photo": to_photo(pix), "cost": pix.width * pix.height * 7}
+        cache.put(key, entry)
+    return entry
+
+
+def visible_tiles(page_size, left, top, width, height):
+    # Mosaicos (columna, fila) que cubren la región visible, en píxeles de la página,
+    # más un margen de TILE_MARGIN mosaicos alrededor
+    img_width, img_height = page_size
+    left -= TILE_MARGIN * TILE_SIZE
+    top -= TILE_MARGIN * TILE_SIZE
+    right = left + width + 2 * TILE_MARGIN * TILE_SIZE
+    bottom = top + height + 2 * TILE_MARGIN * TILE_SIZE
+    first_col = max(0, int(left // TILE_SIZE))
+    first_row = max(0, int(top // TILE_SIZE))
+    last_col = min((img_width - 1) // TILE_SIZE, int(right // TILE_SIZE))
+    last_row = min((img_height - 1) // TILE_SIZE, int(bottom // TILE_SIZE))
+    return {(col, row) for col in range(first_col, last_col + 1) for row in range(first_row, last_row + 1)}
+
+
+def render_tile(page, zoom, tile, page_size, photo=None, to_photo=pixmap_to_photo):
+    # Renderiza un mosaico; photo es una imagen libre del mismo tamaño que se puede reutilizar
+    col, row = tile
+    x0 = col * TILE_SIZE
+    y0 = row * TILE_SIZE
+    x1 = min(x0 + TILE_SIZE, page_size[0])
+    y1 = min(y0 + TILE_SIZE, page_size[1])
+    clip = fitz.Rect(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+    return to_photo(pix, photo)
+
+
+def file_content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_bounds(doc, page_num):
+    # Tamaño de la página sin cargarla: caja de recorte y rotación del diccionario de la página
+    cropbox = doc.page_cropbox(page_num)
+    width, height = cropbox.width, cropbox.height
+    kind, value = doc.xref_get_key(doc.page_xref(page_num), "Rotate")
+    if kind == "int" and int(value) % 180:
+        width, height = height, width
+    return fitz.Rect(0, 0, width, height)
+
+
+def render_page_thumbnails(pdf_path, cache_dir, page_nums, width=PAGE_THUMB_WIDTH, height=PAGE_THUMB_HEIGHT):
+    # Se ejecuta en un proceso aparte; escribe cada miniatura como PNG en la caché
+    os.makedirs(cache_dir, exist_ok=True)
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in page_nums:
+            path = os.path.join(cache_dir, f"{page_num}.png")
+            if os.path.exists(path):
+                continue
+            page = doc[page_num]
+            zoom = min(width / page.rect.width, height / page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            pix.save(temp_path, output="png")
+            os.replace(temp_path, path)
+    finally:
+        doc.close()
+    return page_nums
+
+
+def build_text_index(pdf_path, cache_dir=None, content_hash=None):
+    # Palabras de cada página como [x0, y0, x1, y1, palabra, bloque, línea]. Con cache_dir se
+    # guardan en disco por hash del contenido (el editor usa TEXT_INDEX_CACHE_DIR y lo ejecuta
+    # en un proceso aparte); sin él el índice vive solo en memoria
+    path = None
+    if cache_dir:
+        content_hash = content_hash or file_content_hash(pdf_path)
+        path = os.path.join(cache_dir, f"{content_hash}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    pages = []
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            pages.append([
+                [round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), word, block, line]
+                for x0, y0, x1, y1, word, block, line, _ in page.get_text("words")
+            ])
+    finally:
+        doc.close()
+    if path is None:
+        return pages
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(pages, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+    return pages
+
+
+def normalize_word(word):
+    return word.casefold().strip(".,:;")
+
+
+class TextIndex:
+    # Busca frases en todo el documento a partir de su primera palabra
+    def __init__(self, pages):
+        self.pages = pages
+        self.first_words = {}
+        for page_num, words in enumerate(pages):
+            for i, word in enumerate(words):
+                self.first_words.setdefault(normalize_word(word[4]), []).append((page_num, i))
+    
+    def find(self, phrase):
+        # Devuelve [(página, (x0, y0, x1, y1))]; las palabras deben ser seguidas y de la misma línea
+        terms = [normalize_word(term) for term in phrase.split()]
+        if not terms:
+            return []
+        matches = []
+        for page_num, i in self.first_words.get(terms[0], ()):
+            run = self.pages[page_num][i:i + len(terms)]
+            if len(run) < len(terms):
+                continue
+            if any(normalize_word(word[4]) != term or word[5:7] != run[0][5:7] for word, term in zip(run, terms)):
+                continue
+            matches.append((page_num, (min(w[0] for w in run), min(w[1] for w in run),
+                                       max(w[2] for w in run), max(w[3] for w in run))))
+        return matches
+
+
+def anchor_placements(index, anchor, image_size, position="right", width=DEFAULT_SIGNATURE_WIDTH,
+                      offset=ANCHOR_OFFSET, first_per_page=True):
+    # Resuelve una regla como "a la derecha de 'Firma:'" en todas las páginas de una vez
+    if position not in ANCHOR_POSITIONS:
+        raise ValueError(f"Posición desconocida: {position}")
+    _, _, sig_width, sig_height = SigningEngine.placement_rect(image_size, 0, 0, width)
+    placements = []
+    seen = set()
+    for page_num, (x0, y0, x1, y1) in index.find(anchor):
+        if first_per_page and page_num in seen:
+            continue
+        seen.add(page_num)
+        if position == "right":
+            x, y = x1 + offset, (y0 + y1 - sig_height) / 2
+        elif position == "left":
+            x, y = x0 - offset - sig_width, (y0 + y1 - sig_height) / 2
+        elif position == "above":
+            x, y = x0, y0 - offset - sig_height
+        else:
+            x, y = x0, y1 + offset
+        placements.append((page_num, SigningEngine.placement_rect(image_size, x, y, width)))
+    return placements
+
+
+class SaveCancelled(Exception):
+    pass
+
+
+def insert_signature_image(page, rect, key, images, xrefs):
+    # La imagen se incrusta una sola vez por documento; las demás colocaciones
+    # reutilizan el mismo objeto por su xref
+    xref = xrefs.get(key)
+    if xref:
+        page.insert_image(fitz.Rect(rect), xref=xref, keep_proportion=True)
+    else:
+        xrefs[key] = page.insert_image(fitz.Rect(rect), stream=images[key], keep_proportion=True)
+
+
+def stamp_placements(doc, placements, images, progress=None, cancel_event=None):
+    # placements: {página: [((x1, y1, x2, y2), clave), ...]}, images: {clave: bytes_png}
+    pages = sorted(placements)
+    xrefs = {}
+    for done, page_num in enumerate(pages, 1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise SaveCancelled()
+        page = doc[page_num]
+        for rect, key in placements[page_num]:
+            insert_signature_image(page, rect, key, images, xrefs)
+        if progress:
+            progress(done, len(pages))
+
+
+def export_profile(profile=None):
+    # Completa un perfil parcial con los valores por defecto y valida cada campo
+    settings = dict(DEFAULT_EXPORT_PROFILE)
+    settings.update(profile or {})
+    if settings["codec"] not in EXPORT_CODECS:
+        raise ValueError(f"Códec desconocido: {settings['codec']}")
+    settings["dpi"] = int(settings["dpi"])
+    if settings["dpi"] <= 0:
+        raise ValueError("La resolución debe ser mayor que cero")
+    settings["jpeg_quality"] = max(1, min(100, int(settings["jpeg_quality"])))
+    settings["garbage"] = max(0, min(4, int(settings["garbage"])))
+    settings["deflate"] = bool(settings["deflate"])
+    settings["object_streams"] = bool(settings["object_streams"])
+    settings["incremental"] = bool(settings["incremental"])
+    return settings
+
+
+def load_export_profile(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return export_profile(json.load(f))
+
+
+def save_export_profile(path, profile):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(export_profile(profile), f, indent=4)
+
+
+def pdf_save_options(settings, incremental=False):
+    # La recolección de basura reescribe el archivo entero, así que no vale en guardados incrementales
+    options = {"deflate": settings["deflate"], "use_objstms": int(settings["object_streams"])}
+    if incremental:
+        options.update(incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    else:
+        options["garbage"] = settings["garbage"]
+    return options
+
+
+def save_vector_pdf(pdf_path, save_path, placements, images, progress=None, cancel_event=None, profile=None):
+    # Estampa las firmas sobre las páginas originales y conserva texto y vectores
+    settings = export_profile(profile)
+    doc = fitz.open(pdf_path)
+    try:
+        stamp_placements(doc, placements, images, progress, cancel_event)
+        doc.save(save_path, **pdf_save_options(settings))
+    finally:
+        doc.close()
+
+
+def save_incremental_pdf(pdf_path, save_path, placements, images, progress=None, cancel_event=None, profile=None):
+    # Copia el original byte a byte y le añade al final solo los objetos nuevos o modificados
+    # (imágenes de las firmas, contenido y recursos de las páginas tocadas). Así se conservan
+    # las firmas digitales existentes y el prefijo del archivo sigue siendo idéntico al original.
+    settings = export_profile(profile)
+    shutil.copyfile(pdf_path, save_path)
+    doc = fitz.open(save_path)
+    try:
+        if not doc.can_save_incrementally():
+            raise ValueError("El PDF original está dañado o reparado y no admite guardado incremental")
+        stamp_placements(doc, placements, images, progress, cancel_event)
+        options = pdf_save_options(settings, incremental=True)
+        options["deflate_images"] = True
+        doc.save(save_path, **options)
+    finally:
+        doc.close()
+
+
+def encode_flattened_page(page, settings):
+    # Devuelve (bytes, segundos de codificación) según el códec del perfil
+    zoom = settings["dpi"] / 72
+    codec = settings["codec"]
+    if codec in ("gray", "bilevel"):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+    else:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    start = time.perf_counter()
+    if codec == "jpeg":
+        data = pix.tobytes("jpeg", jpg_quality=settings["jpeg_quality"])
+    elif codec == "bilevel":
+        # Un bit por píxel: suficiente para escaneos en blanco y negro
+        image = Image.frombytes("L", [pix.width, pix.height], pix.samples).convert("1", dither=Image.Dither.NONE)
+        img_buffer = io.BytesIO()
+        image.save(img_buffer, format="PNG")
+        data = img_buffer.getvalue()
+    else:
+        data = pix.tobytes("png")
+    return data, time.perf_counter() - start
+
+
+def flatten_page(doc, page_num, placements, images, xrefs, settings):
+    page = doc[page_num]
+    for rect, key in placements:
+        insert_signature_image(page, rect, key, images, xrefs)
+    data, encode_seconds = encode_flattened_page(page, settings)
+    return page_num, page.rect.width, page.rect.height, data, encode_seconds
+
+
+def flatten_pages_worker(pdf_path, page_placements, images, settings, progress_queue=None, cancel_event=None):
+    # Cada proceso abre su propia copia del documento
+    doc = fitz.open(pdf_path)
+    results = []
+    xrefs = {}
+    try:
+        for page_num, placements in page_placements:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            results.append(flatten_page(doc, page_num, placements, images, xrefs, settings))
+            if progress_queue is not None:
+                progress_queue.put(page_num)
+    finally:
+        doc.close()
+    return results
+
+
+def iter_flattened_pages(pdf_path, placements, images, settings, workers=None, progress=None,
+                         cancel_event=None, max_pages=EXPORT_MAX_PAGES):
+    # Genera (página, ancho, alto, bytes_imagen, segundos_codificación) en orden de página,
+    # con como mucho max_pages páginas rasterizadas pendientes a la vez
+    pages = sorted(placements)
+    total = len(pages)
+    if not total:
+        return
+    workers = min(workers or os.cpu_count() or 1, total)
+    if workers <= 1:
+        # Sin pool se sella página a página en un documento propio: las páginas sin firma
+        # se copian de otro y no deben ver las imágenes aunque compartan /Resources
+        doc = fitz.open(pdf_path)
+        try:
+            xrefs = {}
+            for done, page_num in enumerate(pages, 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SaveCancelled()
+                yield flatten_page(doc, page_num, placements[page_num], images, xrefs, settings)
+                if progress:
+                    progress(done, total)
+        finally:
+            doc.close()
+        return
+
+    # Bloques pequeños para repartir bien la carga entre núcleos, sin superar el límite de memoria
+    chunk_size = max(1, min(-(-total // (workers * 4)), max_pages // workers))
+    chunks = [pages[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        worker_cancel = manager.Event()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            next_chunk = 0
+            in_flight = 0
+            done = 0
+            while futures or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and (not futures or in_flight + len(chunks[next_chunk]) <= max_pages):
+                    # Cada bloque recibe solo las imágenes que usa
+                    chunk_placements = [(p, placements[p]) for p in chunks[next_chunk]]
+                    chunk_images = {key: images[key] for _, items in chunk_placements for _, key in items}
+                    futures.append(pool.submit(flatten_pages_worker, pdf_path, chunk_placements, chunk_images,
+                                               settings, progress_queue, worker_cancel))
+                    in_flight += len(chunk_placements)
+                    next_chunk += 1
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        worker_cancel.set()
+                        for future in futures:
+                            future.cancel()
+                        raise SaveCancelled()
+                    try:
+                        progress_queue.get(timeout=0.1)
+                        done += 1
+                        if progress:
+                            progress(done, total)
+                    except queue.Empty:
+                        if futures[0].done():
+                            break
+                # Los bloques se entregan en orden; los que terminen antes esperan en su futuro
+                results = futures.pop(0).result()
+                in_flight -= len(results)
+                for result in results:
+                    yield result
+
+
+class _SegmentWriter:
+    # Parte de una copia del original y sustituye en su sitio solo las páginas aplanadas, así
+    # las demás páginas y los recursos compartidos (fuentes, imágenes) se escriben una vez.
+    # Cada max_pages páginas sustituidas se vuelcan a un borrador con guardados incrementales y,
+    # al terminar, una pasada final lo reescribe entero en path para que la salida tenga una
+    # sola revisión y el perfil se aplique a todo
+    def __init__(self, source_path, path, settings, max_pages=EXPORT_MAX_PAGES):
+        self.path = path
+        self.scratch_path = path + ".tramos"
+        self.settings = settings
+        self.max_pages = max(1, max_pages)
+        self.doc = fitz.open(source_path)
+        self.buffered = 0
+        self.saved = False
+        self.segments = 0
+    
+    def replace_page(self, page_num, width, height, img_bytes):
+        # Se conserva el objeto de la página para que los enlaces, el índice y /AcroForm que la
+        # apuntan sigan siendo válidos; solo se cambia su contenido por la imagen
+        doc = self.doc
+        page = doc[page_num]
+        # Anotaciones y campos ya están pintados en la imagen; los enlaces no se pintan y se quedan
+        for widget in list(page.widgets()):
+            page.delete_widget(widget)
+        for annot in list(page.annots()):
+            page.delete_annot(annot)
+        contents = doc.get_new_xref()
+        doc.update_object(contents, "<<>>")
+        doc.update_stream(contents, b"")
+        # Recursos propios: los de la página pueden estar compartidos con otras sin aplanar
+        doc.xref_set_key(page.xref, "Contents", f"{contents} 0 R")
+        doc.xref_set_key(page.xref, "Resources", "<<>>")
+        # La imagen ya tiene aplicados el recorte y la rotación de la página
+        doc.xref_set_key(page.xref, "MediaBox", f"[0 0 {width} {height}]")
+        for key in ("CropBox", "TrimBox", "BleedBox", "ArtBox", "Group"):
+            doc.xref_set_key(page.xref, key, "null")
+        doc.xref_set_key(page.xref, "Rotate", "0")
+        page = doc.reload_page(page)
+        page.insert_image(page.rect, stream=img_bytes)
+        self.buffered += 1
+        if self.buffered >= self.max_pages:
+            self.flush()
+    
+    def save_options(self, incremental):
+        options = pdf_save_options(self.settings, incremental=incremental)
+        # Las páginas PNG se guardan como píxeles sin comprimir si no se comprime el flujo
+        options["deflate_images"] = True
+        return options
+    
+    def flush(self):
+        self.doc.save(self.scratch_path, **self.save_options(self.saved))
+        self.doc.close()
+        self.doc = fitz.open(self.scratch_path)
+        self.saved = True
+        self.buffered = 0
+        self.segments += 1
+    
+    def finish(self):
+        # Si todo cupo en memoria se guarda de una vez; si no, se consolida el borrador
+        if self.saved and self.buffered:
+            self.flush()
+        self.doc.save(self.path, **self.save_options(False))
+        self.segments = max(1, self.segments)
+    
+    def close(self):
+        self.doc.close()
+        if os.path.exists(self.scratch_path):
+            os.remove(self.scratch_path)
+
+
+def flatten_pdf(pdf_path, save_path, placements, images, profile=None, workers=None, progress=None,
+                cancel_event=None, max_pages=EXPORT_MAX_PAGES):
+    # Rasteriza en paralelo las páginas con firmas y las sustituye en una copia del original;
+    # el resto de páginas queda sin cambios. La memoria queda acotada por max_pages aunque
+    # el documento tenga miles de páginas. Devuelve estadísticas de la codificación.
+    settings = export_profile(profile)
+    writer = _SegmentWriter(pdf_path, save_path, settings, max_pages)
+    stats = {"flattened_pages": 0, "encode_seconds": 0.0, "image_bytes": 0}
+    try:
+        for page_num, width, height, img_bytes, encode_seconds in iter_flattened_pages(
+                pdf_path, placements, images, settings, workers, progress, cancel_event, max_pages):
+            writer.replace_page(page_num, width, height, img_bytes)
+            stats["flattened_pages"] += 1
+            stats["encode_seconds"] += encode_seconds
+            stats["image_bytes"] += len(img_bytes)
+        writer.finish()
+        stats["segments"] = writer.segments
+    finally:
+        writer.close()
+    stats["encode_seconds"] = round(stats["encode_seconds"], 4)
+    return stats
+
+
+def current_rss(pid=None):
+    # Memoria residente actual en bytes de un proceso (este, si no se indica); None si el
+    # sistema no permite medirla sin dependencias externas
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid or 'self'}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform != "win32":
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+        
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        
+        kernel32 = ctypes.windll.kernel32
+        if pid is None:
+            process = kernel32.GetCurrentProcess()
+        else:
+            # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+            process = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+            if not process:
+                return None
+        try:
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        finally:
+            if pid is not None:
+                kernel32.CloseHandle(process)
+    except Exception:
+        pass
+    return None
+
+
+class MemorySampler:
+    # Pico de memoria residente durante un bloque, muestreado en un hilo. Los picos del sistema
+    # (ru_maxrss, PeakWorkingSetSize) solo crecen en la vida del proceso y, tras una exportación
+    # grande, repetirían ese valor en todas las siguientes.
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self.children_peak = None
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        if self.baseline is not None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.sample()
+        return False
+    
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+    
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+        # Procesos del pool de aplanado y su gestor, sumados en cada muestra
+        children = [current_rss(child.pid) for child in multiprocessing.active_children()]
+        children = [value for value in children if value is not None]
+        if children and sum(children) > (self.children_peak or 0):
+            self.children_peak = sum(children)
+    
+    def report(self):
+        def mb(value):
+            return round(value / 1048576, 1) if value is not None else None
+        return {
+            "export_peak_rss_mb": mb(self.peak),
+            "export_rss_growth_mb": mb(self.peak - self.baseline) if self.peak is not None else None,
+            "export_peak_children_rss_mb": mb(self.children_peak)
+        }
+
+
+def export_pdf(pdf_path, save_path, placements, images, flatten=False, progress=None, cancel_event=None,
+               workers=None, max_pages=EXPORT_MAX_PAGES, profile=None):
+    # Escritura atómica: se guarda en un temporal junto al destino y luego se renombra.
+    # Devuelve un informe con el tiempo, el tamaño, la codificación y la memoria usada en esta exportación.
+    start = time.perf_counter()
+    settings = export_profile(profile)
+    if flatten and settings["incremental"]:
+        raise ValueError("El guardado incremental no es compatible con el aplanado")
+    directory = os.path.dirname(os.path.abspath(save_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".adobo_", suffix=".pdf", dir=directory)
+    os.close(fd)
+    stats = {"flattened_pages": 0, "encode_seconds": 0.0, "image_bytes": 0}
+    sampler = MemorySampler()
+    try:
+        with sampler:
+            if flatten:
+                stats = flatten_pdf(pdf_path, temp_path, placements, images, settings, workers=workers,
+                                    progress=progress, cancel_event=cancel_event, max_pages=max_pages)
+            elif settings["incremental"]:
+                save_incremental_pdf(pdf_path, temp_path, placements, images, progress, cancel_event, settings)
+                stats["appended_bytes"] = os.path.getsize(temp_path) - os.path.getsize(pdf_path)
+            else:
+                save_vector_pdf(pdf_path, temp_path, placements, images, progress, cancel_event, settings)
+        os.replace(temp_path, save_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return {
+        "seconds": round(time.perf_counter() - start, 4),
+        "bytes": os.path.getsize(save_path),
+        "profile": settings,
+        **stats,
+        **sampler.report()
+    }
+
+
+def format_export_report(report):
+    lines = [f"Tamaño: {report['bytes'] / 1024:.1f} KB en {report['seconds']:.2f} s"]
+    if report.get("flattened_pages"):
+        settings = report["profile"]
+        lines.append(f"Páginas aplanadas: {report['flattened_pages']} a {settings['dpi']} ppp en "
+                     f"{settings['codec'].upper()} ({report['image_bytes'] / 1024:.1f} KB de imagen, "
+                     f"codificación {report['encode_seconds']:.2f} s)")
+    if report.get("segments", 0) > 1:
+        lines.append(f"Escrito en {report['segments']} tramos y consolidado en una sola revisión")
+    if "appended_bytes" in report:
+        lines.append(f"Guardado incremental: {report['appended_bytes'] / 1024:.1f} KB añadidos al original")
+    if report.get("export_peak_rss_mb") is not None:
+        memory = (f"Pico de memoria durante la exportación: {report['export_peak_rss_mb']} MB "
+                  f"(+{report['export_rss_growth_mb']} MB sobre el inicio)")
+    else:
+        memory = "Pico de memoria durante la exportación: no disponible"
+    if report.get("export_peak_children_rss_mb"):
+        memory += f"; procesos auxiliares: {report['export_peak_children_rss_mb']} MB"
+    lines.append(memory)
+    return "\n".join(lines)
+
+
+class SignatureStore:
+    # Biblioteca de firmas indexada en SQLite, con miniaturas; se actualiza fila a fila
+    def __init__(self, db_path="signatures.db", legacy_json="signatures.json"):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "name TEXT PRIMARY KEY, image_path TEXT NOT NULL, width INTEGER, height INTEGER, "
+            "thumbnail BLOB, added REAL)"
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(signatures)")]
+        if "embed" not in columns:
+            # Bibliotecas anteriores al optimizador: sus firmas se codifican al usarlas, como antes
+            self.connection.execute("ALTER TABLE signatures ADD COLUMN embed BLOB")
+        self.connection.commit()
+        if legacy_json and os.path.exists(legacy_json) and self.count() == 0:
+            self.migrate_json(legacy_json)
+    
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+    
+    def migrate_json(self, json_path):
+        # Importa una sola vez la biblioteca antigua de signatures.json
+        with open(json_path, "r") as f:
+            signatures_data = json.load(f)
+        for sig_data in signatures_data:
+            if os.path.exists(sig_data["image_path"]):
+                with Image.open(sig_data["image_path"]) as img:
+                    self.add(sig_data["name"], sig_data["image_path"], img, commit=False)
+        self.connection.commit()
+    
+    def add(self, name, image_path, image, commit=True, embed=None):
+        thumbnail = image.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZE)
+        img_buffer = io.BytesIO()
+        thumbnail.save(img_buffer, format="PNG")
+        self.connection.execute(
+            "INSERT OR REPLACE INTO signatures (name, image_path, width, height, thumbnail, added, embed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, image_path, image.width, image.height, img_buffer.getvalue(), time.time(), embed)
+        )
+        if commit:
+            self.connection.commit()
+    
+    def remove(self, name):
+        self.connection.execute("DELETE FROM signatures WHERE name = ?", (name,))
+        self.connection.commit()
+    
+    def list(self):
+        rows = self.connection.execute(
+            "SELECT name, image_path, width, height FROM signatures ORDER BY added, rowid")
+        return [{"name": row[0], "image_path": row[1], "width": row[2], "height": row[3]} for row in rows]
+    
+    def get(self, name):
+        row = self.connection.execute(
+            "SELECT name, image_path, width, height FROM signatures WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "image_path": row[1], "width": row[2], "height": row[3]}
+    
+    def thumbnail(self, name):
+        row = self.connection.execute("SELECT thumbnail FROM signatures WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def embed(self, name):
+        row = self.connection.execute("SELECT embed FROM signatures WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def close(self):
+        self.connection.close()
+
+
+class SigningEngine:
+    # Núcleo sin interfaz: biblioteca de firmas, colocación y guardado
+    def __init__(self, library_path="signatures.db", signatures_dir="signatures"):
+        self.library_path = library_path
+        self.signatures_dir = signatures_dir
+        self.store = None
+        self.encoded_signatures = {}
+        self.signature_sizes = {}
+        self.signature_images = OrderedDict()
+    
+    def get_store(self):
+        # La base se abre al primer uso, en el hilo o proceso que la vaya a usar
+        if self.store is None:
+            legacy_json = os.path.join(os.path.dirname(self.library_path), "signatures.json")
+            self.store = SignatureStore(self.library_path, legacy_json)
+        return self.store
+    
+    def load_library(self):
+        return self.get_store().list()
+    
+    def thumbnail(self, name):
+        return self.get_store().thumbnail(name)
+    
+    def remove_signature(self, name):
+        entry = self.get_store().get(name)
+        if entry and os.path.exists(entry["image_path"]):
+            os.remove(entry["image_path"])
+        self.get_store().remove(name)
+        self.invalidate_signature(name)
+    
+    def invalidate_signature(self, name):
+        self.encoded_signatures.pop(name, None)
+        self.signature_sizes.pop(name, None)
+        self.signature_images.pop(name, None)
+    
+    def load_signature_image(self, name):
+        # Imagen a resolución completa, cargada solo al colocarla por primera vez (LRU)
+        image = self.signature_images.get(name)
+        if image is not None:
+            self.signature_images.move_to_end(name)
+            return image
+        entry = self.get_store().get(name)
+        if entry is None or not os.path.exists(entry["image_path"]):
+            raise KeyError(f"La firma '{name}' no está en la biblioteca")
+        with Image.open(entry["image_path"]) as img:
+            image = img.convert("RGBA")
+        self.cache_signature_image(name, image)
+        return image
+    
+    def cache_signature_image(self, name, image):
+        self.signature_images[name] = image
+        self.signature_images.move_to_end(name)
+        while len(self.signature_images) > SIGNATURE_IMAGE_CACHE:
+            self.signature_images.popitem(last=False)
+    
+    def load_embed(self, name):
+        # Copia optimizada guardada al importar; None si la firma es de una biblioteca anterior
+        if name not in self.encoded_signatures:
+            entry = self.get_store().get(name)
+            data = self.get_store().embed(name) if entry else None
+            if data is None:
+                return None
+            self.encoded_signatures[name] = data
+            self.signature_sizes[name] = (entry["width"], entry["height"])
+        return self.encoded_signatures[name]
+    
+    def encode_signature(self, name, image):
+        # Cada firma se codifica en PNG una sola vez por sesión, si no trae ya su copia optimizada
+        if name not in self.encoded_signatures and self.load_embed(name) is None:
+            img_buffer = io.BytesIO()
+            image.save(img_buffer, format="PNG")
+            self.encoded_signatures[name] = img_buffer.getvalue()
+            self.signature_sizes[name] = image.size
+        return self.encoded_signatures[name]
+    
+    def get_signature(self, name):
+        # Devuelve (bytes_png, (ancho, alto)) leyendo la firma de la biblioteca
+        if name not in self.encoded_signatures and self.load_embed(name) is None:
+            entry = self.get_store().get(name)
+            if entry is None or not os.path.exists(entry["image_path"]):
+                raise KeyError(f"La firma '{name}' no está en la biblioteca")
+            with open(entry["image_path"], "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as img:
+                if img.format == "PNG" and img.mode == "RGBA":
+                    # Las firmas subidas ya están en PNG RGBA: no hace falta recodificar
+                    self.encoded_signatures[name] = data
+                    self.signature_sizes[name] = img.size
+                else:
+                    self.encode_signature(name, img.convert("RGBA"))
+        return self.encoded_signatures[name], self.signature_sizes[name]
+    
+    def import_signature(self, file_path, threshold=BACKGROUND_THRESHOLD, feather=0, colors=SIGNATURE_COLORS):
+        # Quita el fondo, recorta a la tinta y deja codificada la copia que se incrustará
+        with Image.open(file_path) as img:
+            signature_img = crop_to_ink(remove_background(img, threshold, feather))
+        signature_name = os.path.basename(file_path)
+        signature_path = os.path.join(self.signatures_dir, signature_name)
+        signature_img.save(signature_path, format="PNG")
+        embed = encode_signature_blob(signature_img, colors)
+        self.invalidate_signature(signature_name)
+        self.get_store().add(signature_name, signature_path, signature_img, embed=embed)
+        self.encoded_signatures[signature_name] = embed
+        self.signature_sizes[signature_name] = signature_img.size
+        self.cache_signature_image(signature_name, signature_img)
+        return signature_name, signature_img
+    
+    def import_folder(self, folder, threshold=BACKGROUND_THRESHOLD, feather=0, colors=SIGNATURE_COLORS):
+        # Genera (ruta, nombre, imagen, error) por cada escaneo de la carpeta
+        for file_name in sorted(os.listdir(folder)):
+            file_path = os.path.join(folder, file_name)
+            if not file_name.lower().endswith(SIGNATURE_EXTENSIONS) or not os.path.isfile(file_path):
+                continue
+            try:
+                signature_name, signature_img = self.import_signature(file_path, threshold, feather, colors)
+                yield file_path, signature_name, signature_img, None
+            except Exception as e:
+                yield file_path, None, None, str(e)
+    
+    @staticmethod
+    def placement_rect(image_size, x, y, width=DEFAULT_SIGNATURE_WIDTH):
+        height = int(float(image_size[1]) * (width / float(image_size[0])))
+        return (x, y, x + width, y + height)
+    
+    def sign_file(self, input_path, output_path, items, flatten=False, progress=None, cancel_event=None, workers=None,
+                  max_pages=EXPORT_MAX_PAGES, profile=None, text_index_cache=None):
+        # items: [{"signature": nombre, "page": página (desde 1), "x": x, "y": y, "width": ancho}]
+        # o, en lugar de página y posición, {"anchor": texto, "position": right|left|above|below, "offset": puntos};
+        # "rect": [x1, y1, x2, y2] sustituye a x, y y width
+        # Devuelve el informe de export_pdf con el número de firmas colocadas.
+        # text_index_cache: carpeta donde conservar el índice de texto de los anclajes (por defecto, ninguna)
+        placements = {}
+        images = {}
+        index = None
+        count = 0
+        with fitz.open(input_path) as doc:
+            page_count = len(doc)
+        for item in items:
+            name = item["signature"]
+            data, size = self.get_signature(name)
+            images[name] = data
+            width = float(item.get("width") or DEFAULT_SIGNATURE_WIDTH)
+            if item.get("anchor"):
+                if index is None:
+                    index = TextIndex(build_text_index(input_path, text_index_cache))
+                found = anchor_placements(index, item["anchor"], size, item.get("position") or "right", width,
+                                          float(item.get("offset") or ANCHOR_OFFSET))
+                for page_num, rect in found:
+                    placements.setdefault(page_num, []).append((rect, name))
+                count += len(found)
+                continue
+            if item.get("rect"):
+                rect = tuple(float(value) for value in item["rect"])
+            else:
+                rect = self.placement_rect(size, float(item["x"]), float(item["y"]), width)
+            page = int(item["page"])
+            if not 1 <= page <= page_count:
+                raise ValueError(f"La página {page} no existe: el documento tiene {page_count} páginas")
+            placements.setdefault(page - 1, []).append((rect, name))
+            count += 1
+        report = export_pdf(input_path, output_path, placements, images, flatten, progress, cancel_event, workers,
+                            max_pages, profile)
+        report["placements"] = count
+        return report
+
+
+_batch_engine = None
+
+
+def init_batch_worker(library_path, signatures_dir):
+    # Cada proceso mantiene su propio motor, con la caché de firmas ya caliente
+    global _batch_engine
+    _batch_engine = SigningEngine(library_path, signatures_dir)
+
+
+def sign_batch_job(input_path, output_path, items, flatten, max_pages=EXPORT_MAX_PAGES, profile=None,
+                   text_index_cache=None):
+    start = time.perf_counter()
+    result = {"input": input_path, "output": output_path, "placements": len(items)}
+    try:
+        report = _batch_engine.sign_file(input_path, output_path, items, flatten, workers=1,
+                                         max_pages=max_pages, profile=profile, text_index_cache=text_index_cache)
+        result["status"] = "ok"
+        result["placements"] = report["placements"]
+        result["bytes"] = report["bytes"]
+        result["encode_seconds"] = report["encode_seconds"]
+        # Pico del proceso trabajador mientras firmaba este archivo
+        result["export_peak_rss_mb"] = report["export_peak_rss_mb"]
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def read_manifest(manifest_path):
+    # Filas (input, signature, page, x, y, width[, output]) o (input, signature, anchor, position,
+    # offset, width[, output]) agrupadas por PDF de entrada
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    jobs = {}
+    for row in rows:
+        job = jobs.setdefault(row["input"], {"output": row.get("output"), "items": []})
+        job["items"].append(row)
+    return jobs
+
+
+def run_batch(manifest_path, output_dir, workers=None, flatten=False,
+              library_path="signatures.db", signatures_dir="signatures", log=print, max_pages=EXPORT_MAX_PAGES,
+              profile=None, text_index_cache=None):
+    jobs = read_manifest(manifest_path)
+    profile = export_profile(profile)
+    os.makedirs(output_dir, exist_ok=True)
+    # Crea o migra la biblioteca antes de que los procesos la abran a la vez
+    SigningEngine(library_path, signatures_dir).get_store().close()
+    workers = workers or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+    
+    def collect(futures):
+        for future in futures:
+            record(future.result())
+    
+    def record(result):
+        results.append(result)
+        if result["status"] == "ok":
+            log(f"[ok] {result['input']} -> {result['output']} ({result['seconds']:.2f} s, "
+                f"{result['bytes'] / 1024:.1f} KB, codificación {result['encode_seconds']:.2f} s, "
+                f"pico {result['export_peak_rss_mb']} MB)")
+        else:
+            log(f"[error] {result['input']}: {result['error']}")
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                             initargs=(library_path, signatures_dir)) as pool:
+        pending = set()
+        outputs = {}
+        for input_path, job in jobs.items():
+            output_path = job["output"] or os.path.join(
+                output_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}_firma.pdf")
+            # Dos entradas con el mismo nombre en carpetas distintas se pisarían la salida
+            key = os.path.normcase(os.path.abspath(output_path))
+            if key in outputs:
+                record({"input": input_path, "output": output_path, "placements": len(job["items"]),
+                        "status": "error", "seconds": 0,
+                        "error": f"La salida {output_path} coincide con la de {outputs[key]}; "
+                                 f"indica 'output' en el manifiesto"})
+                continue
+            outputs[key] = input_path
+            pending.add(pool.submit(sign_batch_job, input_path, output_path, job["items"], flatten, max_pages,
+                                    profile, text_index_cache))
+            # Número acotado de archivos en curso para no disparar la memoria
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(pending)
+    
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if r["status"] == "ok")
+    placements = sum(r["placements"] for r in results if r["status"] == "ok")
+    summary = {
+        "files": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "placements": placements,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(results) / elapsed, 2) if elapsed else 0,
+        "placements_per_second": round(placements / elapsed, 2) if elapsed else 0,
+        "bytes": sum(r["bytes"] for r in results if r["status"] == "ok"),
+        "encode_seconds": round(sum(r["encode_seconds"] for r in results if r["status"] == "ok"), 4),
+        "profile": profile,
+        # El mayor de los picos por archivo
+        "export_peak_rss_mb": max((r["export_peak_rss_mb"] for r in results if r.get("export_peak_rss_mb")),
+                                  default=None),
+        "results": results
+    }
+    log(f"{summary['files']} archivos ({summary['ok']} correctos, {summary['errors']} con error) en "
+        f"{summary['seconds']:.2f} s: {summary['files_per_second']} archivos/s, "
+        f"{summary['placements_per_second']} firmas/s, "
+        f"pico de memoria por archivo {summary['export_peak_rss_mb']} MB")
+    return summary
+
+
+def validate_placements(items):
+    # Comprueba la forma de cada colocación antes de ocupar un proceso; los errores van al cliente
+    if not isinstance(items, list) or not items:
+        raise ValueError("placements debe ser una lista no vacía")
+    
+    def number(item, key, i):
+        value = item[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"placements[{i}].{key} debe ser un número")
+        return value
+    
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"placements[{i}] debe ser un objeto")
+        if not isinstance(item.get("signature"), str) or not item["signature"]:
+            raise ValueError(f"placements[{i}].signature debe ser el nombre de una firma")
+        if item.get("width") is not None and number(item, "width", i) <= 0:
+            raise ValueError(f"placements[{i}].width debe ser mayor que cero")
+        if item.get("anchor") is not None:
+            if not isinstance(item["anchor"], str) or not item["anchor"].strip():
+                raise ValueError(f"placements[{i}].anchor debe ser un texto")
+            if item.get("position", "right") not in ANCHOR_POSITIONS:
+                raise ValueError(f"placements[{i}].position debe ser una de {', '.join(ANCHOR_POSITIONS)}")
+            if item.get("offset") is not None:
+                number(item, "offset", i)
+            continue
+        page = item.get("page")
+        if isinstance(page, bool) or not isinstance(page, int) or page < 1:
+            raise ValueError(f"placements[{i}].page debe ser un entero desde 1")
+        if item.get("rect") is not None:
+            rect = item["rect"]
+            if (not isinstance(rect, list) or len(rect) != 4
+                    or any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in rect)):
+                raise ValueError(f"placements[{i}].rect debe ser [x1, y1, x2, y2]")
+            if rect[2] <= rect[0] or rect[3] <= rect[1]:
+                raise ValueError(f"placements[{i}].rect está vacío")
+        else:
+            for key in ("x", "y"):
+                if key not in item:
+                    raise ValueError(f"placements[{i}] necesita rect, x e y, o anchor")
+                number(item, key, i)
+
+
+def sign_service_job(pdf_bytes, items, flatten=False, profile=None):
+    # Se ejecuta en un proceso del pool del servicio, con el motor y la caché de firmas ya calientes
+    try:
+        fitz.open(stream=pdf_bytes, filetype="pdf").close()
+    except Exception:
+        raise ValueError("El cuerpo no contiene un PDF válido") from None
+    with tempfile.TemporaryDirectory(prefix="adobo_service_") as work_dir:
+        input_path = os.path.join(work_dir, "entrada.pdf")
+        output_path = os.path.join(work_dir, "firmado.pdf")
+        with open(input_path, "wb") as f:
+            f.write(pdf_bytes)
+        report = _batch_engine.sign_file(input_path, output_path, items, flatten, workers=1, profile=profile)
+        with open(output_path, "rb") as f:
+            return f.read(), report
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class SigningService:
+    # Pool de procesos acotado con una cola de espera limitada; lo que no cabe se rechaza
+    def __init__(self, workers=None, queue_size=SERVICE_QUEUE_SIZE,
+                 library_path="signatures.db", signatures_dir="signatures"):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.library_path = library_path
+        self.signatures_dir = signatures_dir
+        # Crea o migra la biblioteca antes de que los procesos la abran a la vez
+        SigningEngine(library_path, signatures_dir).get_store().close()
+        self.pool = self.create_pool()
+        self.slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.counters = {"requests": 0, "ok": 0, "errors": 0, "rejected": 0, "in_flight": 0,
+                         "placements": 0, "bytes_in": 0, "bytes_out": 0, "pool_restarts": 0}
+        self.latencies = deque(maxlen=SERVICE_LATENCY_WINDOW)
+    
+    def create_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_batch_worker,
+                                   initargs=(self.library_path, self.signatures_dir))
+    
+    def restart_pool(self, broken):
+        # Si un proceso muere el pool queda inservible para siempre; se sustituye una sola vez
+        # aunque varias peticiones lo detecten a la vez
+        with self.lock:
+            if self.pool is not broken:
+                return
+            self.pool = self.create_pool()
+            self.counters["pool_restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    def count(self, **changes):
+        with self.lock:
+            for key, value in changes.items():
+                self.counters[key] += value
+    
+    def sign(self, pdf_bytes, items, flatten=False, profile=None):
+        self.count(requests=1, bytes_in=len(pdf_bytes))
+        if not self.slots.acquire(blocking=False):
+            self.count(rejected=1)
+            raise ServiceBusy()
+        start = time.perf_counter()
+        self.count(in_flight=1)
+        pool = self.pool
+        try:
+            data, report = pool.submit(sign_service_job, pdf_bytes, items, flatten, profile).result()
+        except BrokenProcessPool:
+            self.count(errors=1)
+            self.restart_pool(pool)
+            raise
+        except Exception:
+            self.count(errors=1)
+            raise
+        finally:
+            self.count(in_flight=-1)
+            self.slots.release()
+        with self.lock:
+            self.counters["ok"] += 1
+            self.counters["placements"] += report["placements"]
+            self.counters["bytes_out"] += len(data)
+            self.latencies.append(time.perf_counter() - start)
+        return data, report
+    
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = sorted(self.latencies)
+        uptime = time.perf_counter() - self.started
+        stats["workers"] = self.workers
+        stats["queue_size"] = self.queue_size
+        stats["queued"] = max(0, stats["in_flight"] - self.workers)
+        stats["uptime_seconds"] = round(uptime, 3)
+        stats["requests_per_second"] = round(stats["ok"] / uptime, 3) if uptime else 0
+        # Latencias en milisegundos de las últimas SERVICE_LATENCY_WINDOW peticiones correctas
+        if latencies:
+            stats["latency_ms"] = {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2)
+            }
+        return stats
+    
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class SigningRequestHandler(BaseHTTPRequestHandler):
+    # POST /sign con {"pdf": base64, "placements": [...], "flatten": bool, "profile": {...}}
+    # devuelve el PDF firmado; GET /stats devuelve los contadores y GET /health el estado
+    server_version = "AdoboPEDF"
+    
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.service.stats())
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "Ruta desconocida"})
+    
+    def do_POST(self):
+        if self.path != "/sign":
+            self.send_json(404, {"error": "Ruta desconocida"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.send_json(400, {"error": "Content-Length no válido"})
+            self.close_connection = True
+            return
+        if length <= 0:
+            self.send_json(411, {"error": "Falta el cuerpo de la petición"})
+            return
+        if length > SERVICE_MAX_BODY:
+            self.send_json(413, {"error": "La petición es demasiado grande"})
+            self.close_connection = True
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            pdf_bytes = base64.b64decode(request["pdf"], validate=True)
+            items = request["placements"]
+            validate_placements(items)
+            profile = export_profile(request.get("profile"))
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"Petición no válida: {e}"})
+            return
+        
+        try:
+            data, report = self.server.service.sign(pdf_bytes, items, bool(request.get("flatten")), profile)
+        except ServiceBusy:
+            self.send_json(429, {"error": "Servicio ocupado, reintenta más tarde"}, {"Retry-After": "1"})
+            return
+        except BrokenProcessPool:
+            # El pool ya se ha sustituido; la petición se puede repetir
+            self.log_error("Un proceso de firma terminó de forma inesperada; pool reiniciado")
+            self.send_json(503, {"error": "El proceso de firma se interrumpió, reintenta"}, {"Retry-After": "1"})
+            return
+        except KeyError as e:
+            self.send_json(404, {"error": str(e.args[0]) if e.args else "No encontrado"})
+            return
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            # El detalle puede incluir rutas del servidor: solo va al registro
+            self.log_error("Error al firmar: %s: %s", type(e).__name__, e)
+            self.send_json(500, {"error": "Error interno al firmar el documento"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Adobo-Placements", str(report["placements"]))
+        self.send_header("X-Adobo-Seconds", str(report["seconds"]))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def log_error(self, format, *args):
+        # Los errores se registran siempre, aunque no se pida el detalle de cada petición
+        super().log_message(format, *args)
+
+
+def create_signing_server(service, host="127.0.0.1", port=SERVICE_PORT, verbose=False):
+    server = ThreadingHTTPServer((host, port), SigningRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def run_service(host="127.0.0.1", port=SERVICE_PORT, workers=None, queue_size=SERVICE_QUEUE_SIZE,
+                library_path="signatures.db", signatures_dir="signatures", verbose=False, log=print):
+    service = SigningService(workers, queue_size, library_path, signatures_dir)
+    server = create_signing_server(service, host, port, verbose)
+    log(f"Servicio de firma en http://{host}:{server.server_port} ({service.workers} procesos, "
+        f"cola de {queue_size}); Ctrl+C para detenerlo")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="adobo", description="ADOBO PEDF sin interfaz gráfica")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    sign_parser = subparsers.add_parser("sign", help="Firma por lotes los PDF de un manifiesto JSON o CSV")
+    sign_parser.add_argument("manifest", help="Filas con input, signature, page (desde 1), x, y, width y output opcional; "
+                             "en lugar de page, x e y se puede usar anchor, position y offset")
+    sign_parser.add_argument("--output-dir", default="firmados")
+    sign_parser.add_argument("--workers", type=int, default=None)
+    sign_parser.add_argument("--flatten", action="store_true", help="Aplana las páginas con firmas")
+    sign_parser.add_argument("--max-pages", type=int, default=EXPORT_MAX_PAGES,
+                             help="Páginas de salida en memoria antes de volcarlas a disco al aplanar")
+    sign_parser.add_argument("--profile", help="Perfil de exportación JSON (ppp, códec, opciones de escritura)")
+    sign_parser.add_argument("--report", help="Escribe el resultado por archivo en un JSON")
+    sign_parser.add_argument("--text-index-cache", help="Carpeta donde conservar los índices de texto de los anclajes "
+                                                        "entre ejecuciones (por defecto solo en memoria)")
+    sign_parser.add_argument("--library", default="signatures.db", help="Base de datos de la biblioteca de firmas")
+    sign_parser.add_argument("--signatures-dir", default="signatures")
+    
+    import_parser = subparsers.add_parser("import", help="Importa a la biblioteca todas las firmas escaneadas de una carpeta")
+    import_parser.add_argument("folder")
+    import_parser.add_argument("--threshold", type=int, default=BACKGROUND_THRESHOLD,
+                               help="Brillo a partir del cual un píxel se considera fondo (0-255)")
+    import_parser.add_argument("--feather", type=float, default=0, help="Radio de suavizado del borde de la tinta")
+    import_parser.add_argument("--colors", type=int, default=SIGNATURE_COLORS,
+                               help="Colores de la copia incrustada: 0 = sin pérdida, 1 = un color + transparencia, "
+                                    "2-256 = paleta")
+    import_parser.add_argument("--library", default="signatures.db", help="Base de datos de la biblioteca de firmas")
+    import_parser.add_argument("--signatures-dir", default="signatures")
+    
+    serve_parser = subparsers.add_parser("serve", help="Servicio HTTP local de firma")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_parser.add_argument("--workers", type=int, default=None)
+    serve_parser.add_argument("--queue", type=int, default=SERVICE_QUEUE_SIZE,
+                              help="Peticiones que pueden esperar a un proceso libre antes de responder 429")
+    serve_parser.add_argument("--library", default="signatures.db", help="Base de datos de la biblioteca de firmas")
+    serve_parser.add_argument("--signatures-dir", default="signatures")
+    serve_parser.add_argument("--verbose", action="store_true", help="Registra cada petición")
+    
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        run_service(args.host, args.port, args.workers, args.queue, args.library, args.signatures_dir, args.verbose)
+        return 0
+    if args.command == "sign":
+        profile = load_export_profile(args.profile) if args.profile else None
+        summary = run_batch(args.manifest, args.output_dir, args.workers, args.flatten,
+                            args.library, args.signatures_dir, max_pages=args.max_pages, profile=profile,
+                            text_index_cache=args.text_index_cache)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(summary, f, indent=4)
+        return 1 if summary["errors"] else 0
+    if args.command == "import":
+        engine = SigningEngine(args.library, args.signatures_dir)
+        os.makedirs(args.signatures_dir, exist_ok=True)
+        errors = 0
+        for file_path, signature_name, _, error in engine.import_folder(args.folder, args.threshold, args.feather,
+                                                                         args.colors):
+            if error:
+                errors += 1
+                print(f"[error] {file_path}: {error}")
+                continue
+            print(f"[ok] {file_path} -> {signature_name}")
+        return 1 if errors else 0
+    return 0
+
+
+class SplashScreen:
+    def __init__(self, root, logo_path, duration=None):
+        self.root = root
+        self.root.overrideredirect(True)
+        self.root.attributes("-topmost", True)
+        
+        try:
+            # Tk lee el PNG directamente: el splash no espera a que se importe PIL
+            self.logo = tk.PhotoImage(file=logo_path)
+            factor = max(-(-self.logo.width() // 400), -(-self.logo.height() // 300), 1)
+            if factor > 1:
+                self.logo = self.logo.subsample(factor)
+        except Exception as e:
+            print(f"Error al cargar el logo: {e}")
+            self.logo = None
+        
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - 400) // 2
+        y = (screen_height - 300) // 2
+        self.root.geometry(f"400x300+{x}+{y}")
+        
+        self.canvas = tk.Canvas(self.root, width=400, height=300, bg="white")
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        if self.logo:
+            self.canvas.create_image(200, 150, image=self.logo)
+        
+        if duration:
+            self.root.after(duration, self.close_splash)
+    
+    def close_splash(self):
+        self.root.destroy()
+
+class StartupTimer:
+    def __init__(self, start=STARTUP_TIME):
+        self.start = start
+        self.marks = []
+    
+    def mark(self, name):
+        self.marks.append((name, round(time.perf_counter() - self.start, 4)))
+    
+    def report(self):
+        option = os.environ.get(STARTUP_TIMING_ENV)
+        if not option or option == "0":
+            return
+        path = STARTUP_TIMING_FILE if option == "1" else option
+        print("Arranque: " + ", ".join(f"{name} {seconds:.3f} s" for name, seconds in self.marks))
+        try:
+            with open(path, "w") as f:
+                json.dump(dict(self.marks), f, indent=4)
+        except OSError as e:
+            print(f"No se pudo guardar el informe de arranque: {e}")
+
+class SaveProgressDialog:
+    def __init__(self, root, on_cancel):
+        self.window = tk.Toplevel(root)
+        self.window.title("Guardando PDF")
+        self.window.transient(root)
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", on_cancel)
+        
+        self.label = ttk.Label(self.window, text="Preparando...")
+        self.label.pack(padx=10, pady=(10, 5))
+        self.progress = ttk.Progressbar(self.window, length=300, mode="determinate")
+        self.progress.pack(padx=10, pady=5)
+        self.cancel_button = ttk.Button(self.window, text="Cancelar", command=on_cancel)
+        self.cancel_button.pack(padx=10, pady=(5, 10))
+    
+    def update_progress(self, done, total):
+        self.progress["maximum"] = max(total, 1)
+        self.progress["value"] = done
+        self.label.config(text=f"Página {done} de {total}")
+    
+    def set_cancelling(self):
+        self.label.config(text="Cancelando...")
+        self.cancel_button.config(state=tk.DISABLED)
+    
+    def close(self):
+        self.window.destroy()
+
+class ExportSettingsDialog:
+    # Opciones de exportación antes de elegir el destino; show() devuelve el perfil o None
+    def __init__(self, root, profile):
+        self.result = None
+        self.window = tk.Toplevel(root)
+        self.window.title("Opciones de exportación")
+        self.window.transient(root)
+        self.window.resizable(False, False)
+        
+        self.dpi_var = tk.IntVar()
+        self.codec_var = tk.StringVar()
+        self.quality_var = tk.IntVar()
+        self.deflate_var = tk.BooleanVar()
+        self.garbage_var = tk.IntVar()
+        self.object_streams_var = tk.BooleanVar()
+        self.incremental_var = tk.BooleanVar()
+        
+        form = ttk.Frame(self.window, padding=10)
+        form.pack(fill=tk.BOTH)
+        ttk.Label(form, text="Resolución al aplanar (ppp):").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(form, from_=72, to=600, increment=25, textvariable=self.dpi_var, width=8).grid(row=0, column=1, sticky=tk.W)
+        ttk.Label(form, text="Códec de las páginas aplanadas:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        codec_combobox = ttk.Combobox(form, state="readonly", values=EXPORT_CODECS, textvariable=self.codec_var, width=8)
+        codec_combobox.grid(row=1, column=1, sticky=tk.W)
+        codec_combobox.bind("<<ComboboxSelected>>", lambda event: self.update_quality_state())
+        ttk.Label(form, text="Calidad JPEG (1-100):").grid(row=2, column=0, sticky=tk.W, pady=2)
+        self.quality_spinbox = ttk.Spinbox(form, from_=1, to=100, textvariable=self.quality_var, width=8)
+        self.quality_spinbox.grid(row=2, column=1, sticky=tk.W)
+        ttk.Label(form, text="Recolección de basura (0-4):").grid(row=3, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(form, from_=0, to=4, textvariable=self.garbage_var, width=8).grid(row=3, column=1, sticky=tk.W)
+        ttk.Checkbutton(form, text="Comprimir flujos (deflate)", variable=self.deflate_var).grid(row=4, column=0, columnspan=2, sticky=tk.W)
+        ttk.Checkbutton(form, text="Flujos de objetos", variable=self.object_streams_var).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+        ttk.Checkbutton(form, text="Guardado incremental (conserva intacto el original; no se puede aplanar)",
+                        variable=self.incremental_var).grid(row=6, column=0, columnspan=2, sticky=tk.W)
+        
+        buttons = ttk.Frame(self.window, padding=(10, 0, 10, 10))
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="Cargar perfil", command=self.load_profile).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Guardar perfil", command=self.save_profile).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Cancelar", command=self.window.destroy).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Aceptar", command=self.accept).pack(side=tk.RIGHT, padx=5)
+        
+        self.set_profile(profile)
+        self.window.grab_set()
+    
+    def set_profile(self, profile):
+        self.dpi_var.set(profile["dpi"])
+        self.codec_var.set(profile["codec"])
+        self.quality_var.set(profile["jpeg_quality"])
+        self.deflate_var.set(profile["deflate"])
+        self.garbage_var.set(profile["garbage"])
+        self.object_streams_var.set(profile["object_streams"])
+        self.incremental_var.set(profile["incremental"])
+        self.update_quality_state()
+    
+    def get_profile(self):
+        return export_profile({
+            "dpi": self.dpi_var.get(),
+            "codec": self.codec_var.get(),
+            "jpeg_quality": self.quality_var.get(),
+            "deflate": self.deflate_var.get(),
+            "garbage": self.garbage_var.get(),
+            "object_streams": self.object_streams_var.get(),
+            "incremental": self.incremental_var.get()
+        })
+    
+    def update_quality_state(self):
+        self.quality_spinbox.config(state=tk.NORMAL if self.codec_var.get() == "jpeg" else tk.DISABLED)
+    
+    def load_profile(self):
+        path = filedialog.askopenfilename(parent=self.window, filetypes=[("Perfil JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.set_profile(load_export_profile(path))
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo cargar el perfil:\n{str(e)}", parent=self.window)
+    
+    def save_profile(self):
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".json",
+                                            filetypes=[("Perfil JSON", "*.json")], initialfile=EXPORT_PROFILE_FILE)
+        if not path:
+            return
+        try:
+            save_export_profile(path, self.get_profile())
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo guardar el perfil:\n{str(e)}", parent=self.window)
+    
+    def accept(self):
+        try:
+            self.result = self.get_profile()
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Error", f"Opciones no válidas:\n{str(e)}", parent=self.window)
+            return
+        self.window.destroy()
+    
+    def show(self):
+        self.window.wait_window()
+        return self.result
+
+class AnchorPlacementDialog:
+    # Regla de colocación automática: firma, texto ancla y posición respecto a él
+    POSITION_LABELS = {"right": "A la derecha", "left": "A la izquierda", "above": "Encima", "below": "Debajo"}
+    
+    def __init__(self, root, signature_names, selected=0):
+        self.result = None
+        self.window = tk.Toplevel(root)
+        self.window.title("Colocar firmas por texto")
+        self.window.transient(root)
+        self.window.resizable(False, False)
+        
+        self.anchor_var = tk.StringVar(value="Firma:")
+        self.position_var = tk.StringVar(value=self.POSITION_LABELS["right"])
+        self.signature_var = tk.StringVar(value=signature_names[selected] if signature_names else "")
+        self.width_var = tk.DoubleVar(value=DEFAULT_SIGNATURE_WIDTH)
+        self.offset_var = tk.DoubleVar(value=ANCHOR_OFFSET)
+        self.first_per_page_var = tk.BooleanVar(value=True)
+        
+        form = ttk.Frame(self.window, padding=10)
+        form.pack(fill=tk.BOTH)
+        ttk.Label(form, text="Texto ancla:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        anchor_entry = ttk.Entry(form, textvariable=self.anchor_var, width=30)
+        anchor_entry.grid(row=0, column=1, sticky=tk.W)
+        ttk.Label(form, text="Posición:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(form, state="readonly", values=list(self.POSITION_LABELS.values()),
+                     textvariable=self.position_var, width=15).grid(row=1, column=1, sticky=tk.W)
+        ttk.Label(form, text="Firma:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(form, state="readonly", values=signature_names,
+                     textvariable=self.signature_var, width=27).grid(row=2, column=1, sticky=tk.W)
+        ttk.Label(form, text="Ancho (puntos):").grid(row=3, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(form, from_=30, to=500, increment=10, textvariable=self.width_var, width=8).grid(row=3, column=1, sticky=tk.W)
+        ttk.Label(form, text="Separación (puntos):").grid(row=4, column=0, sticky=tk.W, pady=2)
+        ttk.Spinbox(form, from_=0, to=100, textvariable=self.offset_var, width=8).grid(row=4, column=1, sticky=tk.W)
+        ttk.Checkbutton(form, text="Solo la primera aparición de cada página",
+                        variable=self.first_per_page_var).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+        
+        buttons = ttk.Frame(self.window, padding=(10, 0, 10, 10))
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="Cancelar", command=self.window.destroy).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Colocar", command=self.accept).pack(side=tk.RIGHT, padx=5)
+        
+        anchor_entry.focus_set()
+        self.window.grab_set()
+    
+    def accept(self):
+        positions = {label: key for key, label in self.POSITION_LABELS.items()}
+        try:
+            rule = {
+                "anchor": self.anchor_var.get().strip(),
+                "position": positions[self.position_var.get()],
+                "signature": self.signature_var.get(),
+                "width": self.width_var.get(),
+                "offset": self.offset_var.get(),
+                "first_per_page": self.first_per_page_var.get()
+            }
+        except tk.TclError as e:
+            messagebox.showerror("Error", f"Opciones no válidas:\n{str(e)}", parent=self.window)
+            return
+        if not rule["anchor"] or not rule["signature"]:
+            messagebox.showwarning("Advertencia", "Indica el texto ancla y la firma.", parent=self.window)
+            return
+        self.result = rule
+        self.window.destroy()
+    
+    def show(self):
+        self.window.wait_window()
+        return self.result
+
+class PDFEditor:
+    def __init__(self, root, library=None):
+        self.root = root
+        self.root.title("ADOBO PEDF")
+        self.root.geometry("1200x800")
+        
+        try:
+            logo_icon = Image.open(LOGO_PATH)
+            logo_icon = logo_icon.resize((32, 32), Image.Resampling.LANCZOS)
+            self.icon = ImageTk.PhotoImage(logo_icon)
+            self.root.iconphoto(True, self.icon)
+        except Exception as e:
+            print(f"Error al cargar el ícono: {e}")
+        
+        # Directorio para almacenar firmas
+        self.signatures_dir = "signatures"
+        if not os.path.exists(self.signatures_dir):
+            os.makedirs(self.signatures_dir)
+        
+        self.signatures_db = "signatures.db"
+        self.background_threshold = BACKGROUND_THRESHOLD
+        self.background_feather = 0
+        self.signature_colors = SIGNATURE_COLORS
+        self.engine = SigningEngine(self.signatures_db, self.signatures_dir)
+        self.pdf_path = None
+        self.pdf_document = None
+        self.current_page = 0
+        self.total_pages = 0
+        self.page_image = None
+        self.page_size = None
+        self.tiles = {}
+        self.tile_job = None
+        # Imágenes de Tk de mosaicos descartados, para reutilizarlas en los siguientes
+        self.free_tile_photos = []
+        self.preview_photo = None
+        self.tk_image = None
+        self.zoom_level = 1.0
+        self.page_cache = PageRenderCache()
+        self.prefetch_job = None
+        self.render_generation = 0
+        self.refine_job = None
+        self.frame_job = None
+        self.layout_job = None
+        self.layout_offset = (0, 0)
+        self.page_rects = {}
+        # Vista continua: posiciones de todas las páginas, pero solo las visibles tienen imagen
+        self.continuous_var = tk.BooleanVar(value=False)
+        self.continuous_tops = []
+        self.continuous_sizes = []
+        self.continuous_width = 0
+        self.continuous_height = 0
+        self.continuous_center = 0
+        self.live_pages = {}
+        self.continuous_job = None
+        self.page_fill_job = None
+        self.signature_scaler = SignatureScaler()
+        
+        self.signatures = {}
+        # Páginas que tienen al menos una firma colocada
+        self.dirty_pages = set()
+        self.signature_index = {}
+        self.available_signatures = []
+        self.selected_signature = None
+        self.selected_available_signature = None
+        self.drag_data = {"x": 0, "y": 0, "item": None, "dragging": False}
+        self.resize_data = {"active": False, "corner": None, "start_x": 0, "start_y": 0}
+        self.stored_signature = None
+        self.save_job = None
+        # Por defecto se guarda en vectorial; aplanar es opcional
+        self.flatten_var = tk.BooleanVar(value=False)
+        # Perfil de exportación por defecto del directorio de trabajo, si existe
+        try:
+            self.export_profile = load_export_profile(EXPORT_PROFILE_FILE)
+        except FileNotFoundError:
+            self.export_profile = export_profile()
+        except Exception as e:
+            print(f"Error al cargar el perfil de exportación: {e}")
+            self.export_profile = export_profile()
+        
+        # Estilo
+        self.style = ttk.Style()
+        self.style.configure('TButton', padding=5, font=('Arial', 10))
+        self.style.configure('TLabel', font=('Arial', 10))
+        
+        # Barra superior con todos los botones
+        self.top_bar = ttk.Frame(self.root, relief=tk.RAISED, borderwidth=1)
+        self.top_bar.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        
+        # Botones de herramientas
+        self.load_button = ttk.Button(self.top_bar, text="Cargar PDF", command=self.load_pdf)
+        self.load_button.pack(side=tk.LEFT, padx=5)
+        
+        self.upload_button = ttk.Button(self.top_bar, text="Subir Firma", command=self.upload_signature)
+        self.upload_button.pack(side=tk.LEFT, padx=5)
+        
+        self.import_folder_button = ttk.Button(self.top_bar, text="Importar Carpeta", command=self.import_signature_folder)
+        self.import_folder_button.pack(side=tk.LEFT, padx=5)
+        
+        self.signature_select_combobox = ttk.Combobox(self.top_bar, state="readonly", width=15)
+        self.signature_select_combobox.pack(side=tk.LEFT, padx=5)
+        self.signature_select_combobox.bind("<<ComboboxSelected>>", self.on_signature_select_to_add)
+        
+        self.signature_preview = ttk.Label(self.top_bar)
+        self.signature_preview.pack(side=tk.LEFT, padx=5)
+        self.thumbnail_images = {}
+        
+        self.delete_button = ttk.Button(self.top_bar, text="Eliminar Firma Disponible", command=self.delete_available_signature)
+        self.delete_button.pack(side=tk.LEFT, padx=5)
+        
+        self.anchor_button = ttk.Button(self.top_bar, text="Firmar por Texto", command=self.place_at_text_anchor)
+        self.anchor_button.pack(side=tk.LEFT, padx=5)
+        
+        self.save_button = ttk.Button(self.top_bar, text="Guardar PDF", command=self.save_pdf)
+        self.save_button.pack(side=tk.LEFT, padx=5)
+        
+        self.flatten_check = ttk.Checkbutton(self.top_bar, text="Aplanar", variable=self.flatten_var)
+        self.flatten_check.pack(side=tk.LEFT, padx=5)
+        
+        self.continuous_check = ttk.Checkbutton(self.top_bar, text="Vista continua", variable=self.continuous_var, command=self.toggle_continuous)
+        self.continuous_check.pack(side=tk.LEFT, padx=5)
+        
+        # Botones de navegación
+        self.prev_button = ttk.Button(self.top_bar, text="◄", command=self.prev_page, width=3)
+        self.prev_button.pack(side=tk.LEFT, padx=5)
+        
+        self.page_label = ttk.Label(self.top_bar, text="Página: 0/0")
+        self.page_label.pack(side=tk.LEFT, padx=5)
+        
+        self.next_button = ttk.Button(self.top_bar, text="►", command=self.next_page, width=3)
+        self.next_button.pack(side=tk.LEFT, padx=5)
+        
+        # Botones de zoom
+        self.zoom_in_button = ttk.Button(self.top_bar, text="+", command=lambda: self.adjust_zoom(1.2), width=3)
+        self.zoom_in_button.pack(side=tk.LEFT, padx=5)
+        
+        self.zoom_out_button = ttk.Button(self.top_bar, text="-", command=lambda: self.adjust_zoom(0.8), width=3)
+        self.zoom_out_button.pack(side=tk.LEFT, padx=5)
+        
+        self.zoom_reset_button = ttk.Button(self.top_bar, text="100%", command=self.reset_zoom, width=5)
+        self.zoom_reset_button.pack(side=tk.LEFT, padx=5)
+        
+        # Llamar a load_available_signatures después de crear el Combobox
+        self.load_available_signatures(library)
+        
+        # Área de visualización del PDF (ocupa todo el espacio)
+        self.viewer_frame = ttk.Frame(self.root)
+        self.viewer_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # Barra lateral de miniaturas (solo se dibujan las visibles)
+        self.thumb_frame = ttk.Frame(self.viewer_frame)
+        self.thumb_frame.pack(side=tk.LEFT, fill=tk.Y)
+        self.thumb_canvas = tk.Canvas(self.thumb_frame, width=PAGE_THUMB_WIDTH + 20, bg="dim gray", highlightthickness=0)
+        self.thumb_canvas.pack(side=tk.LEFT, fill=tk.Y)
+        self.thumb_scroll = ttk.Scrollbar(self.thumb_frame, orient=tk.VERTICAL, command=self.on_thumb_scroll)
+        self.thumb_scroll.pack(side=tk.LEFT, fill=tk.Y)
+        self.thumb_canvas.configure(yscrollcommand=self.thumb_scroll.set)
+        self.thumb_canvas.bind("<Button-1>", self.on_thumbnail_click)
+        self.thumb_canvas.bind("<MouseWheel>", self.on_thumb_wheel)
+        self.thumb_canvas.bind("<Configure>", lambda event: self.schedule_thumbnail_update())
+        self.page_thumbs = {}
+        self.thumb_cache_dir = None
+        self.thumb_pool = None
+        self.thumb_futures = []
+        self.thumb_pending = set()
+        self.thumb_job = None
+        self.thumb_poll_job = None
+        # Índice de palabras del documento, construido en segundo plano para la colocación por texto
+        self.text_index = None
+        
+        self.canvas = tk.Canvas(self.viewer_frame, bg="gray")
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.v_scroll = ttk.Scrollbar(self.viewer_frame, orient=tk.VERTICAL, command=self.on_v_scroll)
+        self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.h_scroll = ttk.Scrollbar(self.viewer_frame, orient=tk.HORIZONTAL, command=self.on_h_scroll)
+        self.h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.canvas.configure(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
+        
+        # Vincular eventos
+        self.canvas.bind("<Button-1>", self.on_canvas_click)
+        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+        self.canvas.bind("<Motion>", self.on_mouse_move)
+        self.canvas.bind("<Button-3>", self.on_canvas_right_click)
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        
+        # Vincular el evento de cierre
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    
+    def close_window(self):
+        if self.thumb_pool:
+            self.thumb_pool.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
+    def on_closing(self):
+        if self.save_job:
+            messagebox.showwarning("Advertencia", "Espera a que termine el guardado o cancélalo antes de cerrar.")
+            return
+        if not self.pdf_document:
+            self.close_window()
+            return
+
+        response = messagebox.askyesnocancel(
+            "Guardar cambios",
+            "¿Deseas guardar los cambios antes de cerrar?",
+            icon="question"
+        )
+
+        if response is True:  # Sí
+            # Se cierra cuando el guardado en segundo plano termine correctamente
+            self.save_pdf(on_success=self.close_window)
+        elif response is False:  # No
+            self.close_window()
+        # Si response es None, significa que se seleccionó "Cancelar", así que no hacemos nada
+    
+    def load_available_signatures(self, library=None):
+        # Solo se leen nombres y miniaturas; las imágenes se cargan al colocarlas
+        try:
+            self.available_signatures = library if library is not None else self.engine.load_library()
+            self.update_signature_select_combobox()
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron cargar las firmas:\n{str(e)}")
+    
+    def load_pdf(self):
+        file_path = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
+        if not file_path:
+            messagebox.showwarning("Advertencia", "No se seleccionó ningún archivo PDF.")
+            return
+        try:
+            self.pdf_path = file_path
+            self.pdf_document = fitz.open(self.pdf_path)
+            self.total_pages = len(self.pdf_document)
+            self.current_page = 0
+            self.signatures = {i: [] for i in range(self.total_pages)}
+            self.dirty_pages = set()
+            self.signature_index = {}
+            self.page_cache.clear()
+            self.page_size = None
+            self.page_rects = {}
+            self.text_index = None
+            self.live_pages = {}
+            self.continuous_tops = []
+            self.update_page_label()
+            self.reset_thumbnails()
+            self.root.after(100, self.display_page)
+            messagebox.showinfo("Éxito", f"PDF cargado correctamente: {os.path.basename(file_path)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo cargar el PDF:\n{str(e)}")
+    
+    def display_page(self):
+        if not self.pdf_document:
+            return
+        self.clear_continuous_view()
+        if self.continuous_var.get():
+            self.display_continuous()
+            return
+        self.canvas.delete("all")
+        self.release_tiles()
+        try:
+            img_width, img_height = self.get_page_pixel_size(self.current_page, self.zoom_level)
+            self.page_size = (img_width, img_height)
+            self.layout_offset = self.page_offset()
+            self.canvas.config(scrollregion=(0, 0, img_width, img_height))
+            if img_width * img_height > TILED_RENDER_PIXELS:
+                # Con mucho zoom solo se renderizan los mosaicos visibles
+                self.page_image = None
+                self.tk_image = None
+                self.update_visible_tiles()
+            else:
+                entry = self.get_page_render(self.current_page, self.zoom_level)
+                self.page_image = entry["pixmap"]
+                self.tk_image = entry["photo"]
+                x_offset, y_offset = self.layout_offset
+                self.canvas.create_image(x_offset, y_offset, anchor=tk.NW, image=self.tk_image)
+                self.schedule_prefetch()
+            self.restore_signatures()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al mostrar la página:\n{str(e)}")
+    
+    def request_render(self):
+        # Render en dos fases: vista previa inmediata y render nítido cuando la entrada se calma.
+        # Cada petición nueva invalida las anteriores que aún no se han refinado.
+        if not self.pdf_document:
+            return
+        self.render_generation += 1
+        if self.refine_job:
+            self.root.after_cancel(self.refine_job)
+            self.refine_job = None
+        if self.continuous_var.get():
+            # En la vista continua las páginas sin caché se rellenan de forma progresiva
+            self.display_page()
+            return
+        width, height = self.get_page_pixel_size(self.current_page, self.zoom_level)
+        if (self.current_page, round(self.zoom_level, 4)) in self.page_cache or width * height > TILED_RENDER_PIXELS:
+            self.display_page()
+            return
+        try:
+            self.display_preview(width, height)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al mostrar la página:\n{str(e)}")
+            return
+        generation = self.render_generation
+        self.refine_job = self.root.after(REFINE_DELAY, lambda: self.refine_render(generation))
+    
+    def refine_render(self, generation):
+        self.refine_job = None
+        if generation == self.render_generation:
+            self.display_page()
+    
+    def display_preview(self, width, height):
+        # Reutiliza la página en caché a otro zoom si existe; si no, renderiza a baja resolución
+        source = None
+        for (page_num, zoom), entry in self.page_cache.entries.items():
+            if page_num == self.current_page and (source is None or entry["pixmap"].width > source.width):
+                source = entry["pixmap"]
+        if source is None:
+            preview_zoom = min(self.zoom_level, PREVIEW_ZOOM)
+            source = self.pdf_document[self.current_page].get_pixmap(matrix=fitz.Matrix(preview_zoom, preview_zoom))
+        
+        self.canvas.delete("all")
+        self.release_tiles()
+        self.page_size = (width, height)
+        # Escalado con PyMuPDF; la imagen de la vista previa se reutiliza entre páginas del mismo tamaño
+        self.page_image = fitz.Pixmap(source, width, height, None)
+        self.preview_photo = pixmap_to_photo(self.page_image, self.preview_photo)
+        self.tk_image = self.preview_photo
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        self.layout_offset = self.page_offset()
+        self.canvas.create_image(self.layout_offset[0], self.layout_offset[1], anchor=tk.NW, image=self.tk_image)
+        self.restore_signatures()
+    
+    def schedule_render(self):
+        # Agrupa las peticiones de un mismo fotograma en un solo render
+        if not self.frame_job:
+            self.frame_job = self.root.after(FRAME_INTERVAL, self.run_scheduled_render)
+    
+    def run_scheduled_render(self):
+        self.frame_job = None
+        self.request_render()
+    
+    def schedule_relayout(self):
+        if not self.layout_job:
+            self.layout_job = self.root.after(FRAME_INTERVAL, self.relayout)
+    
+    def relayout(self):
+        # Al redimensionar la ventana la resolución no cambia: basta con recentrar lo dibujado
+        self.layout_job = None
+        if not self.page_size:
+            return
+        if self.continuous_var.get():
+            # Todas las páginas comparten el eje central, así que basta un desplazamiento horizontal
+            center = max(self.canvas.winfo_width(), self.continuous_width) / 2
+            dx = center - self.continuous_center
+            if dx:
+                self.canvas.move("all", dx, 0)
+                self.continuous_center = center
+                self.layout_offset = self.page_origin(self.current_page)
+            self.schedule_view_update()
+            return
+        x_offset, y_offset = self.page_offset()
+        dx = x_offset - self.layout_offset[0]
+        dy = y_offset - self.layout_offset[1]
+        if dx or dy:
+            self.canvas.move("all", dx, dy)
+            self.layout_offset = (x_offset, y_offset)
+        self.schedule_view_update()
+    
+    def get_page_rect(self, page_num):
+        rect = self.page_rects.get(page_num)
+        if rect is None:
+            rect = self.page_rects[page_num] = page_bounds(self.pdf_document, page_num)
+        return rect
+    
+    def get_page_pixel_size(self, page_num, zoom):
+        irect = (self.get_page_rect(page_num) * fitz.Matrix(zoom, zoom)).irect
+        return irect.width, irect.height
+    
+    def page_origin(self, page_num):
+        # Esquina superior izquierda de la página en el lienzo
+        if not self.continuous_var.get() or not self.continuous_tops:
+            return self.layout_offset
+        return self.continuous_center - self.continuous_sizes[page_num][0] / 2, self.continuous_tops[page_num]
+    
+    def page_at(self, y):
+        # Página bajo la coordenada vertical del lienzo (la anterior si cae en el hueco entre dos)
+        page_num = bisect.bisect_right(self.continuous_tops, y) - 1
+        return max(0, min(self.total_pages - 1, page_num))
+    
+    def compute_continuous_layout(self):
+        # Solo usa el tamaño de cada página, sin renderizar nada
+        self.continuous_tops = []
+        self.continuous_sizes = []
+        y = CONTINUOUS_GAP
+        for page_num in range(self.total_pages):
+            width, height = self.get_page_pixel_size(page_num, self.zoom_level)
+            self.continuous_tops.append(y)
+            self.continuous_sizes.append((width, height))
+            y += height + CONTINUOUS_GAP
+        self.continuous_width = max(width for width, height in self.continuous_sizes) + 2 * CONTINUOUS_GAP
+        self.continuous_height = y
+        self.continuous_center = max(self.canvas.winfo_width(), self.continuous_width) / 2
+    
+    def display_continuous(self):
+        # Se conserva la posición relativa dentro de la página visible al cambiar el zoom
+        anchor = None
+        if self.continuous_tops:
+            top = self.canvas.canvasy(0)
+            page_num = self.page_at(top)
+            anchor = (page_num, (top - self.continuous_tops[page_num]) / self.continuous_sizes[page_num][1])
+        self.canvas.delete("all")
+        self.release_tiles()
+        self.page_image = None
+        self.tk_image = None
+        try:
+            self.compute_continuous_layout()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al mostrar la página:\n{str(e)}")
+            return
+        self.canvas.config(scrollregion=(0, 0, self.continuous_width, self.continuous_height))
+        if anchor:
+            page_num, fraction = anchor
+            y = self.continuous_tops[page_num] + fraction * self.continuous_sizes[page_num][1]
+            self.canvas.yview_moveto(y / self.continuous_height)
+        else:
+            self.canvas.yview_moveto(0)
+        self.focus_page(self.current_page)
+        self.update_continuous_view()
+    
+    def clear_continuous_view(self):
+        for page_num in list(self.live_pages):
+            self.evict_page(page_num)
+    
+    def evict_page(self, page_num):
+        # Libera la imagen y los elementos del lienzo de una página que ya no se ve
+        for item in self.live_pages.pop(page_num)["items"]:
+            self.canvas.delete(item)
+        for signature in self.signatures.get(page_num, []):
+            for item in signature.get("canvas_items", {}).values():
+                self.canvas.delete(item)
+            signature["canvas_items"] = {}
+            signature.pop("tk_image", None)
+    
+    def update_continuous_view(self):
+        self.continuous_job = None
+        if not self.pdf_document or not self.continuous_var.get() or not self.continuous_tops:
+            return
+        top = self.canvas.canvasy(0)
+        first = max(0, self.page_at(top) - CONTINUOUS_BUFFER)
+        last = min(self.total_pages - 1, self.page_at(top + self.canvas.winfo_height()) + CONTINUOUS_BUFFER)
+        for page_num in list(self.live_pages):
+            if not first <= page_num <= last:
+                self.evict_page(page_num)
+        
+        zoom_key = round(self.zoom_level, 4)
+        for page_num in range(first, last + 1):
+            if page_num in self.live_pages:
+                continue
+            # Marcador blanco hasta que la página esté renderizada
+            x, y = self.page_origin(page_num)
+            width, height = self.continuous_sizes[page_num]
+            placeholder = self.canvas.create_rectangle(x, y, x + width, y + height, fill="white", outline="", tags="page")
+            self.canvas.tag_lower(placeholder)
+            self.live_pages[page_num] = {"items": [placeholder], "photo": None}
+            if (page_num, zoom_key) in self.page_cache:
+                self.attach_page_image(page_num, self.get_page_render(page_num, self.zoom_level))
+            for signature in self.signatures.get(page_num, []):
+                self.draw_signature(signature, page_num=page_num)
+        self.schedule_page_fill()
+    
+    def attach_page_image(self, page_num, entry):
+        live = self.live_pages[page_num]
+        for item in live["items"]:
+            self.canvas.delete(item)
+        x, y = self.page_origin(page_num)
+        item = self.canvas.create_image(x, y, anchor=tk.NW, image=entry["photo"], tags="page")
+        self.canvas.tag_lower(item)
+        live["items"] = [item]
+        live["photo"] = entry["photo"]
+    
+    def schedule_page_fill(self):
+        if not self.page_fill_job:
+            self.page_fill_job = self.root.after_idle(self.fill_next_page)
+    
+    def fill_next_page(self):
+        # Renderiza una página por llamada, empezando por la más cercana al centro de la vista
+        self.page_fill_job = None
+        pending = [page_num for page_num, live in self.live_pages.items() if live["photo"] is None]
+        if not pending:
+            return
+        center = self.page_at(self.canvas.canvasy(self.canvas.winfo_height() / 2))
+        page_num = min(pending, key=lambda p: abs(p - center))
+        try:
+            self.attach_page_image(page_num, self.get_page_render(page_num, self.zoom_level))
+        except Exception:
+            return
+        if len(pending) > 1:
+            self.page_fill_job = self.root.after_idle(self.fill_next_page)
+    
+    def focus_page(self, page_num):
+        # La página activa recibe las inserciones y la edición de firmas
+        if page_num != self.current_page:
+            self.select_signature(None)
+            self.current_page = page_num
+            self.update_page_label()
+        self.page_size = self.continuous_sizes[page_num]
+        self.layout_offset = self.page_origin(page_num)
+    
+    def focus_visible_page(self):
+        self.focus_page(self.page_at(self.canvas.canvasy(self.canvas.winfo_height() / 2)))
+    
+    def scroll_to_page(self, page_num):
+        self.canvas.yview_moveto((self.continuous_tops[page_num] - CONTINUOUS_GAP) / self.continuous_height)
+        self.focus_page(page_num)
+        self.schedule_view_update()
+    
+    def toggle_continuous(self):
+        if not self.pdf_document:
+            return
+        self.select_signature(None)
+        self.continuous_tops = []
+        self.canvas.yview_moveto(0)
+        self.display_page()
+        if self.continuous_var.get():
+            self.scroll_to_page(self.current_page)
+    
+    def schedule_view_update(self):
+        if self.continuous_var.get():
+            if not self.continuous_job:
+                self.continuous_job = self.root.after_idle(self.update_continuous_view)
+        else:
+            self.schedule_tile_update()
+    
+    def page_offset(self):
+        # Desplazamiento de la página en el lienzo (centrada si cabe)
+        if not self.page_size:
+            return 0, 0
+        img_width, img_height = self.page_size
+        canvas_width = self.canvas.winfo_width() or 700
+        canvas_height = self.canvas.winfo_height() or 800
+        x_offset = (canvas_width - img_width) / 2 if canvas_width > img_width else 0
+        y_offset = (canvas_height - img_height) / 2 if canvas_height > img_height else 0
+        return x_offset, y_offset
+    
+    def update_visible_tiles(self):
+        self.tile_job = None
+        if not self.pdf_document or self.page_image or not self.page_size or self.continuous_var.get():
+            return
+        x_offset, y_offset = self.layout_offset
+        wanted = visible_tiles(self.page_size, self.canvas.canvasx(0) - x_offset, self.canvas.canvasy(0) - y_offset,
+                               self.canvas.winfo_width(), self.canvas.winfo_height())
+        
+        for key in list(self.tiles):
+            if key not in wanted:
+                tile = self.tiles.pop(key)
+                self.canvas.delete(tile["item"])
+                self.free_tile_photos.append(tile["photo"])
+        
+        page = self.pdf_document[self.current_page]
+        for col, row in sorted(wanted - set(self.tiles)):
+            photo = render_tile(page, self.zoom_level, (col, row), self.page_size,
+                                self.free_tile_photos.pop() if self.free_tile_photos else None)
+            item = self.canvas.create_image(x_offset + col * TILE_SIZE, y_offset + row * TILE_SIZE, anchor=tk.NW,
+                                            image=photo, tags="tile")
+            self.canvas.tag_lower(item)
+            self.tiles[(col, row)] = {"photo": photo, "item": item}
+    
+    def release_tiles(self):
+        # Los elementos del lienzo ya se han borrado; las imágenes quedan para los próximos mosaicos
+        for tile in self.tiles.values():
+            self.free_tile_photos.append(tile["photo"])
+        self.tiles = {}
+        del self.free_tile_photos[TILE_PHOTO_POOL:]
+    
+    def schedule_tile_update(self):
+        if self.page_size and not self.page_image and not self.tile_job:
+            self.tile_job = self.root.after_idle(self.update_visible_tiles)
+    
+    def on_v_scroll(self, *args):
+        self.canvas.yview(*args)
+        if self.continuous_var.get() and self.continuous_tops:
+            self.focus_visible_page()
+        self.schedule_view_update()
+    
+    def on_h_scroll(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_view_update()
+    
+    def get_page_render(self, page_num, zoom):
+        return render_page_entry(self.pdf_document, page_num, zoom, self.page_cache)
+    
+    def schedule_prefetch(self):
+        if self.prefetch_job:
+            self.root.after_cancel(self.prefetch_job)
+        self.prefetch_job = self.root.after(PREFETCH_DELAY, self.prefetch_neighbors)
+    
+    def prefetch_neighbors(self):
+        # Renderiza en tiempo ocioso una página vecina por llamada, para no bloquear la interfaz
+        self.prefetch_job = None
+        if not self.pdf_document:
+            return
+        zoom = self.zoom_level
+        for page_num in (self.current_page + 1, self.current_page - 1):
+            if not (0 <= page_num < self.total_pages) or (page_num, round(zoom, 4)) in self.page_cache:
+                continue
+            width, height = self.get_page_pixel_size(page_num, zoom)
+            if width * height <= TILED_RENDER_PIXELS:
+                try:
+                    self.get_page_render(page_num, zoom)
+                except Exception:
+                    return
+                self.prefetch_job = self.root.after_idle(self.prefetch_neighbors)
+                return
+    
+    def upload_signature(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.bmp")])
+        if not file_path:
+            messagebox.showwarning("Advertencia", "No se seleccionó ninguna imagen de firma.")
+            return
+        try:
+            signature_name, signature_img = self.engine.import_signature(
+                file_path, self.background_threshold, self.background_feather, self.signature_colors)
+            self.invalidate_signature_renders(signature_name)
+            self.available_signatures = self.engine.load_library()
+            self.update_signature_select_combobox()
+            messagebox.showinfo("Éxito", f"Firma '{signature_name}' añadida correctamente.")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo subir la firma:\n{str(e)}")
+    
+    def import_signature_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            messagebox.showwarning("Advertencia", "No se seleccionó ninguna carpeta.")
+            return
+        imported = 0
+        errors = []
+        for file_path, signature_name, signature_img, error in self.engine.import_folder(
+                folder, self.background_threshold, self.background_feather, self.signature_colors):
+            if error:
+                errors.append(f"{os.path.basename(file_path)}: {error}")
+                continue
+            self.invalidate_signature_renders(signature_name)
+            imported += 1
+        self.available_signatures = self.engine.load_library()
+        self.update_signature_select_combobox()
+        if errors:
+            messagebox.showwarning("Advertencia", f"Se importaron {imported} firmas. Errores:\n" + "\n".join(errors[:10]))
+        else:
+            messagebox.showinfo("Éxito", f"Se importaron {imported} firmas correctamente.")
+    
+    def delete_available_signature(self):
+        selected_index = self.signature_select_combobox.current()
+        if selected_index < 0:
+            messagebox.showwarning("Advertencia", "No hay firma seleccionada para eliminar.")
+            return
+        try:
+            signature_name = self.available_signatures[selected_index]["name"]
+            self.engine.remove_signature(signature_name)
+            self.invalidate_signature_renders(signature_name)
+            del self.available_signatures[selected_index]
+            
+            self.update_signature_select_combobox()
+            messagebox.showinfo("Éxito", "Firma eliminada de las disponibles correctamente.")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo eliminar la firma:\n{str(e)}")
+    
+    def invalidate_signature_renders(self, name):
+        self.thumbnail_images.pop(name, None)
+        self.signature_scaler.invalidate(name)
+    
+    def get_scaled_signature(self, signature_data, width, height, fast=False):
+        return self.signature_scaler.scale(signature_data, width, height, fast)
+    
+    def draw_signature(self, signature_data, fast=False, page_num=None):
+        if not signature_data or not self.page_size:
+            return
+        if page_num is None:
+            page_num = self.current_page
+        
+        scaled_width = int(signature_data["original_width"] * self.zoom_level)
+        scaled_height = int(signature_data["original_height"] * self.zoom_level)
+        scaled_image = self.get_scaled_signature(signature_data, scaled_width, scaled_height, fast)
+        tk_signature = ImageTk.PhotoImage(scaled_image)
+        
+        x_offset, y_offset = self.page_origin(page_num)
+        
+        x = signature_data["original_x"] * self.zoom_level + x_offset
+        y = signature_data["original_y"] * self.zoom_level + y_offset
+        
+        signature_data["tk_image"] = tk_signature
+        signature_id = self.canvas.create_image(x, y, anchor=tk.NW, image=tk_signature, tags="signature")
+        box_id = self.canvas.create_rectangle(
+            x, y, x + scaled_width, y + scaled_height,
+            outline="red", dash=(5, 2), width=2, tags="signature_box"
+        )
+        dot_id = self.canvas.create_oval(
+            x - 5, y + scaled_height - 5, x + 5, y + scaled_height + 5,
+            fill="blue", tags="signature_dot"
+        )
+        signature_data["canvas_items"] = {"signature": signature_id, "box": box_id, "dot": dot_id}
+    
+    def restore_signatures(self):
+        for signature in self.signatures.get(self.current_page, []):
+            self.draw_signature(signature)
+    
+    def update_signature_select_combobox(self):
+        self.signature_select_combobox["values"] = [sig["name"] for sig in self.available_signatures]
+        if self.available_signatures:
+            self.signature_select_combobox.current(0)
+        else:
+            self.signature_select_combobox.set("")
+        self.show_signature_thumbnail()
+    
+    def show_signature_thumbnail(self):
+        selected_index = self.signature_select_combobox.current()
+        if selected_index < 0:
+            self.signature_preview.config(image="")
+            return
+        name = self.available_signatures[selected_index]["name"]
+        if name not in self.thumbnail_images:
+            data = self.engine.thumbnail(name)
+            self.thumbnail_images[name] = tk.PhotoImage(data=data) if data else ""
+        self.signature_preview.config(image=self.thumbnail_images[name])
+    
+    def on_signature_select_to_add(self, event):
+        selected_index = self.signature_select_combobox.current()
+        self.show_signature_thumbnail()
+        if selected_index >= 0:
+            self.selected_available_signature = self.available_signatures[selected_index]
+            messagebox.showinfo("Instrucción", "Haz clic en el lienzo para insertar la firma.")
+    
+    def select_signature(self, signature_index):
+        for sig in self.signatures.get(self.current_page, []):
+            if "box" in sig.get("canvas_items", {}):
+                self.canvas.itemconfig(sig["canvas_items"]["box"], outline="red")
+        
+        if signature_index is not None and 0 <= signature_index < len(self.signatures.get(self.current_page, [])):
+            self.selected_signature = signature_index
+            if "box" in self.signatures[self.current_page][signature_index].get("canvas_items", {}):
+                self.canvas.itemconfig(self.signatures[self.current_page][signature_index]["canvas_items"]["box"], outline="blue")
+        else:
+            self.selected_signature = None
+    
+    def insert_signature_at(self, x, y):
+        if self.selected_available_signature:
+            try:
+                signature_img = self.engine.load_signature_image(self.selected_available_signature["name"])
+                x1, y1, x2, y2 = SigningEngine.placement_rect(signature_img.size, x, y)
+                
+                signature_data = {
+                    "name": self.selected_available_signature["name"],
+                    "original_image": signature_img,
+                    "original_x": x,
+                    "original_y": y,
+                    "original_width": x2 - x1,
+                    "original_height": y2 - y1,
+                    "canvas_items": {}
+                }
+                if self.current_page not in self.signatures:
+                    self.signatures[self.current_page] = []
+                self.signatures[self.current_page].append(signature_data)
+                self.get_signature_index(self.current_page).insert(signature_data)
+                self.update_dirty_page(self.current_page)
+                self.draw_signature(signature_data)
+                self.selected_available_signature = None
+                messagebox.showinfo("Éxito", "Firma insertada correctamente.")
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo insertar la firma:\n{str(e)}")
+    
+    def place_at_text_anchor(self):
+        if not self.pdf_document:
+            messagebox.showwarning("Advertencia", "No hay documento PDF cargado.")
+            return
+        if not self.available_signatures:
+            messagebox.showwarning("Advertencia", "No hay firmas disponibles.")
+            return
+        if self.text_index is None:
+            messagebox.showinfo("Información", "El índice de texto del documento aún se está preparando. "
+                                               "Inténtalo de nuevo en unos segundos.")
+            return
+        names = [sig["name"] for sig in self.available_signatures]
+        rule = AnchorPlacementDialog(self.root, names, max(0, self.signature_select_combobox.current())).show()
+        if rule is None:
+            return
+        
+        start = time.perf_counter()
+        try:
+            signature_img = self.engine.load_signature_image(rule["signature"])
+            found = anchor_placements(self.text_index, rule["anchor"], signature_img.size, rule["position"],
+                                      rule["width"], rule["offset"], rule["first_per_page"])
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron colocar las firmas:\n{str(e)}")
+            return
+        if not found:
+            messagebox.showinfo("Información", f"No se encontró el texto '{rule['anchor']}' en el documento.")
+            return
+        
+        # Alta en bloque: las firmas se añaden a las listas y a los índices ya creados, sin dibujar página a página
+        for page_num, (x1, y1, x2, y2) in found:
+            signature_data = {
+                "name": rule["signature"],
+                "original_image": signature_img,
+                "original_x": x1,
+                "original_y": y1,
+                "original_width": x2 - x1,
+                "original_height": y2 - y1,
+                "canvas_items": {}
+            }
+            self.signatures.setdefault(page_num, []).append(signature_data)
+            if page_num in self.signature_index:
+                self.signature_index[page_num].insert(signature_data)
+            self.dirty_pages.add(page_num)
+        self.display_page()
+        pages = len({page_num for page_num, _ in found})
+        messagebox.showinfo("Éxito", f"Se colocaron {len(found)} firmas en {pages} páginas "
+                                     f"en {time.perf_counter() - start:.2f} s.")
+    
+    def get_signature_index(self, page_num):
+        if page_num not in self.signature_index:
+            self.signature_index[page_num] = SignatureGrid()
+            for signature in self.signatures.get(page_num, []):
+                self.signature_index[page_num].insert(signature)
+        return self.signature_index[page_num]
+    
+    def position_of(self, signature):
+        # Posición por identidad: comparar diccionarios miraría campo a campo, imágenes incluidas,
+        # y dos firmas idénticas en la misma posición se confundirían
+        for i, candidate in enumerate(self.signatures[self.current_page]):
+            if candidate is signature:
+                return i
+        raise ValueError("La firma no está en la página actual")
+    
+    def hit_test(self, x, y, tolerance=0, page_num=None):
+        # x, y en coordenadas del lienzo
+        if page_num is None:
+            page_num = self.current_page
+        x_offset, y_offset = self.page_origin(page_num)
+        page_x = (x - x_offset) / self.zoom_level
+        page_y = (y - y_offset) / self.zoom_level
+        return self.get_signature_index(page_num).hit_test(page_x, page_y, self.zoom_level, tolerance)
+    
+    def on_mouse_move(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        # En la vista continua el cursor responde a la página que hay debajo sin cambiar la activa
+        page_num = self.page_at(y) if self.continuous_var.get() and self.continuous_tops else self.current_page
+        if not self.signatures.get(page_num):
+            self.canvas.config(cursor="arrow")
+            return
+        
+        signature, region = self.hit_test(x, y, page_num=page_num)
+        if region == "dot":
+            self.canvas.config(cursor="size_nw_se")
+        elif region == "body":
+            self.canvas.config(cursor="fleur")
+        elif region:
+            self.canvas.config(cursor="size_" + region)
+        else:
+            self.canvas.config(cursor="arrow")
+    
+    def on_canvas_click(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        if self.continuous_var.get() and self.continuous_tops:
+            self.focus_page(self.page_at(y))
+        x_offset, y_offset = self.layout_offset
+        
+        if self.selected_available_signature and self.page_size:
+            canvas_x = (x - x_offset) / self.zoom_level
+            canvas_y = (y - y_offset) / self.zoom_level
+            self.insert_signature_at(canvas_x, canvas_y)
+            return
+        
+        signature, region = self.hit_test(x, y, tolerance=5)
+        if signature is None:
+            self.select_signature(None)
+            return
+        
+        i = self.position_of(signature)
+        self.select_signature(i)
+        if region == "body":
+            self.drag_data = {
+                "x": (x - x_offset) / self.zoom_level,
+                "y": (y - y_offset) / self.zoom_level,
+                "item": i,
+                "start_x": signature["original_x"],
+                "start_y": signature["original_y"],
+                "dragging": False
+            }
+        else:
+            self.resize_data = {
+                "active": True,
+                "corner": "sw" if region == "dot" else region,
+                "start_x": (x - x_offset) / self.zoom_level,
+                "start_y": (y - y_offset) / self.zoom_level,
+                "start_width": signature["original_width"],
+                "start_height": signature["original_height"]
+            }
+    
+    def on_canvas_drag(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        x_offset, y_offset = self.layout_offset
+        canvas_x = (x - x_offset) / self.zoom_level
+        canvas_y = (y - y_offset) / self.zoom_level
+        
+        if self.resize_data["active"] and self.selected_signature is not None:
+            signature = self.signatures[self.current_page][self.selected_signature]
+            dx = canvas_x - self.resize_data["start_x"]
+            dy = canvas_y - self.resize_data["start_y"]
+            
+            if self.resize_data["corner"] == "nw":
+                new_width = self.resize_data["start_width"] - dx
+                new_height = self.resize_data["start_height"] - dy
+                new_x = self.resize_data["start_x"] + dx
+                new_y = self.resize_data["start_y"] + dy
+            elif self.resize_data["corner"] == "ne":
+                new_width = self.resize_data["start_width"] + dx
+                new_height = self.resize_data["start_height"] - dy
+                new_x = signature["original_x"]
+                new_y = self.resize_data["start_y"] + dy
+            elif self.resize_data["corner"] == "sw":
+                new_width = self.resize_data["start_width"] - dx
+                new_height = self.resize_data["start_height"] + dy
+                new_x = self.resize_data["start_x"] + dx
+                new_y = signature["original_y"]
+            elif self.resize_data["corner"] == "se":
+                new_width = self.resize_data["start_width"] + dx
+                new_height = self.resize_data["start_height"] + dy
+                new_x = signature["original_x"]
+                new_y = signature["original_y"]
+            
+            new_width = max(30, new_width)
+            new_height = max(30, new_height)
+            
+            if event.state & 0x1:  # Shift key pressed
+                aspect = signature["original_width"] / signature["original_height"]
+                new_height = new_width / aspect
+            
+            signature["original_width"] = new_width
+            signature["original_height"] = new_height
+            if self.resize_data["corner"] in ["nw", "sw"]:
+                signature["original_x"] = new_x
+            if self.resize_data["corner"] in ["nw", "ne"]:
+                signature["original_y"] = new_y
+            
+            self.get_signature_index(self.current_page).update(signature)
+            self.redraw_signature(self.selected_signature, fast=True)
+        
+        elif self.drag_data.get("item") is not None:
+            signature = self.signatures[self.current_page][self.drag_data["item"]]
+            dx = canvas_x - self.drag_data["x"]
+            dy = canvas_y - self.drag_data["y"]
+            
+            if abs(dx) > 5 or abs(dy) > 5:
+                self.drag_data["dragging"] = True
+            
+            if self.drag_data["dragging"]:
+                signature["original_x"] = self.drag_data["start_x"] + dx
+                signature["original_y"] = self.drag_data["start_y"] + dy
+                self.get_signature_index(self.current_page).update(signature)
+                self.redraw_signature(self.drag_data["item"], resized=False)
+    
+    def on_canvas_release(self, event):
+        if self.resize_data["active"] and self.selected_signature is not None:
+            # El remuestreo de alta calidad se hace una sola vez al soltar
+            self.redraw_signature(self.selected_signature)
+        self.resize_data["active"] = False
+        self.drag_data["item"] = None
+        self.drag_data["dragging"] = False
+    
+    def redraw_signature(self, signature_index, fast=False, resized=True):
+        if not (0 <= signature_index < len(self.signatures.get(self.current_page, []))):
+            return
+        signature = self.signatures[self.current_page][signature_index]
+        items = signature.get("canvas_items")
+        if not items:
+            self.draw_signature(signature, fast)
+            return
+        
+        # Se actualizan los elementos existentes en lugar de borrarlos y recrearlos
+        scaled_width = int(signature["original_width"] * self.zoom_level)
+        scaled_height = int(signature["original_height"] * self.zoom_level)
+        x_offset, y_offset = self.layout_offset
+        x = signature["original_x"] * self.zoom_level + x_offset
+        y = signature["original_y"] * self.zoom_level + y_offset
+        if resized:
+            tk_signature = ImageTk.PhotoImage(self.get_scaled_signature(signature, scaled_width, scaled_height, fast))
+            signature["tk_image"] = tk_signature
+            self.canvas.itemconfig(items["signature"], image=tk_signature)
+        self.canvas.coords(items["signature"], x, y)
+        self.canvas.coords(items["box"], x, y, x + scaled_width, y + scaled_height)
+        self.canvas.coords(items["dot"], x - 5, y + scaled_height - 5, x + 5, y + scaled_height + 5)
+    
+    def on_canvas_right_click(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        if self.continuous_var.get() and self.continuous_tops:
+            self.focus_page(self.page_at(y))
+        signature, region = self.hit_test(x, y, tolerance=5)
+        if signature is not None and region != "dot":
+            self.selected_signature = self.position_of(signature)
+            self.delete_signature()
+    
+    def delete_signature(self):
+        if self.selected_signature is None:
+            messagebox.showwarning("Advertencia", "No hay firma seleccionada para eliminar.")
+            return
+        try:
+            signature = self.signatures[self.current_page][self.selected_signature]
+            for item in signature["canvas_items"].values():
+                self.canvas.delete(item)
+            self.get_signature_index(self.current_page).remove(signature)
+            del self.signatures[self.current_page][self.selected_signature]
+            self.update_dirty_page(self.current_page)
+            self.selected_signature = None
+            self.display_page()
+            messagebox.showinfo("Éxito", "Firma eliminada correctamente.")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo eliminar la firma:\n{str(e)}")
+    
+    def save_pdf(self, on_success=None):
+        if not self.pdf_document:
+            messagebox.showwarning("Advertencia", "No hay documento PDF cargado.")
+            return
+        if self.save_job:
+            messagebox.showwarning("Advertencia", "Ya hay un guardado en curso.")
+            return
+
+        profile = ExportSettingsDialog(self.root, self.export_profile).show()
+        if profile is None:
+            return
+        self.export_profile = profile
+        if profile["incremental"] and self.flatten_var.get():
+            messagebox.showwarning("Advertencia", "El guardado incremental no es compatible con el aplanado. "
+                                                  "Desmarca una de las dos opciones.")
+            return
+        
+        original_name = os.path.splitext(os.path.basename(self.pdf_path))[0]
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")],
+            initialfile=f"{original_name}_firma.pdf"
+        )
+        if not save_path:
+            return
+
+        try:
+            placements, images = self.collect_placements()
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo guardar el PDF:\n{str(e)}")
+            return
+        
+        # El guardado trabaja sobre una copia de las firmas, así se puede seguir navegando
+        job = {
+            "path": save_path,
+            "events": queue.Queue(),
+            "cancel": threading.Event(),
+            "on_success": on_success
+        }
+        job["dialog"] = SaveProgressDialog(self.root, self.cancel_save)
+        job["thread"] = threading.Thread(
+            target=self.run_save_job,
+            args=(job, self.pdf_path, placements, images, self.flatten_var.get(), profile),
+            daemon=True
+        )
+        self.save_job = job
+        self.save_button.config(state=tk.DISABLED)
+        job["thread"].start()
+        self.root.after(100, self.poll_save_job)
+    
+    def run_save_job(self, job, pdf_path, placements, images, flatten, profile):
+        # Se ejecuta en el hilo de guardado: no debe tocar widgets de Tk
+        def progress(done, total):
+            job["events"].put(("progress", done, total))
+        
+        try:
+            report = export_pdf(pdf_path, job["path"], placements, images, flatten, progress, job["cancel"],
+                                profile=profile)
+            job["events"].put(("done", report))
+        except SaveCancelled:
+            job["events"].put(("cancelled",))
+        except Exception as e:
+            job["events"].put(("error", str(e)))
+    
+    def poll_save_job(self):
+        job = self.save_job
+        if not job:
+            return
+        result = None
+        while True:
+            try:
+                event = job["events"].get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "progress":
+                job["dialog"].update_progress(event[1], event[2])
+            else:
+                result = event
+        if result is None:
+            self.root.after(100, self.poll_save_job)
+            return
+        
+        job["dialog"].close()
+        self.save_job = None
+        self.save_button.config(state=tk.NORMAL)
+        if result[0] == "done":
+            messagebox.showinfo("Éxito", f"PDF guardado correctamente en:\n{job['path']}\n\n{format_export_report(result[1])}")
+            if job["on_success"]:
+                job["on_success"]()
+        elif result[0] == "error":
+            messagebox.showerror("Error", f"No se pudo guardar el PDF:\n{result[1]}")
+    
+    def cancel_save(self):
+        if self.save_job:
+            self.save_job["cancel"].set()
+            self.save_job["dialog"].set_cancelling()
+    
+    def update_dirty_page(self, page_num):
+        if self.signatures.get(page_num):
+            self.dirty_pages.add(page_num)
+        else:
+            self.dirty_pages.discard(page_num)
+    
+    def collect_placements(self):
+        placements = {}
+        images = {}
+        for page_num in sorted(self.dirty_pages):
+            placements[page_num] = []
+            for signature in self.signatures[page_num]:
+                x1 = signature["original_x"]
+                y1 = signature["original_y"]
+                x2 = x1 + signature["original_width"]
+                y2 = y1 + signature["original_height"]
+                name = signature["name"]
+                images[name] = self.engine.encode_signature(name, signature["original_image"])
+                placements[page_num].append(((x1, y1, x2, y2), name))
+        return placements, images
+    
+    def prev_page(self):
+        if self.pdf_document and self.current_page > 0:
+            self.go_to_page(self.current_page - 1)
+    
+    def next_page(self):
+        if self.pdf_document and self.current_page < self.total_pages - 1:
+            self.go_to_page(self.current_page + 1)
+    
+    def update_page_label(self):
+        self.page_label.config(text=f"Página: {self.current_page + 1}/{self.total_pages}")
+        self.highlight_current_thumbnail()
+    
+    def go_to_page(self, page_num):
+        if self.pdf_document and 0 <= page_num < self.total_pages and page_num != self.current_page:
+            if self.continuous_var.get() and self.continuous_tops:
+                self.scroll_to_page(page_num)
+                return
+            self.current_page = page_num
+            self.canvas.yview_moveto(0)
+            self.schedule_render()
+            self.update_page_label()
+    
+    def get_thumb_pool(self):
+        if self.thumb_pool is None:
+            # Dos procesos: las miniaturas no esperan a que termine el índice de texto
+            self.thumb_pool = ProcessPoolExecutor(max_workers=2)
+        return self.thumb_pool
+    
+    def reset_thumbnails(self):
+        self.thumb_canvas.delete("all")
+        self.page_thumbs = {}
+        self.thumb_pending = set()
+        self.thumb_futures = []
+        self.thumb_cache_dir = None
+        self.thumb_canvas.config(scrollregion=(0, 0, PAGE_THUMB_WIDTH + 20, self.total_pages * PAGE_THUMB_SLOT))
+        self.thumb_canvas.yview_moveto(0)
+        # El hash del contenido identifica la caché en disco; se calcula en el proceso de fondo
+        future = self.get_thumb_pool().submit(file_content_hash, self.pdf_path)
+        self.thumb_futures.append(("hash", self.pdf_path, future))
+        self.schedule_thumbnail_poll()
+        self.schedule_thumbnail_update()
+    
+    def schedule_thumbnail_update(self):
+        if not self.thumb_job:
+            self.thumb_job = self.root.after_idle(self.update_thumbnails)
+    
+    def schedule_thumbnail_poll(self):
+        if not self.thumb_poll_job:
+            self.thumb_poll_job = self.root.after(100, self.poll_thumbnail_jobs)
+    
+    def poll_thumbnail_jobs(self):
+        self.thumb_poll_job = None
+        pending = []
+        changed = False
+        for kind, pdf_path, future in self.thumb_futures:
+            if not future.done():
+                pending.append((kind, pdf_path, future))
+                continue
+            if pdf_path != self.pdf_path or future.cancelled() or future.exception():
+                continue
+            if kind == "hash":
+                self.thumb_cache_dir = os.path.join(THUMBNAIL_CACHE_DIR, future.result())
+                text_future = self.get_thumb_pool().submit(
+                    build_text_index, self.pdf_path, TEXT_INDEX_CACHE_DIR, future.result())
+                pending.append(("text", self.pdf_path, text_future))
+            elif kind == "text":
+                self.text_index = TextIndex(future.result())
+                continue
+            else:
+                self.thumb_pending.difference_update(future.result())
+            changed = True
+        self.thumb_futures = pending
+        if changed:
+            self.schedule_thumbnail_update()
+        if pending:
+            self.schedule_thumbnail_poll()
+    
+    def update_thumbnails(self):
+        self.thumb_job = None
+        if not self.pdf_document:
+            return
+        top = self.thumb_canvas.canvasy(0)
+        height = self.thumb_canvas.winfo_height()
+        first = max(0, int(top // PAGE_THUMB_SLOT))
+        last = min(self.total_pages - 1, int((top + height) // PAGE_THUMB_SLOT))
+        visible = set(range(first, last + 1))
+        
+        for page_num in list(self.page_thumbs):
+            if page_num not in visible:
+                for item in self.page_thumbs.pop(page_num)["items"]:
+                    self.thumb_canvas.delete(item)
+        
+        missing = []
+        for page_num in sorted(visible):
+            thumb = self.page_thumbs.get(page_num)
+            if thumb is None:
+                y = page_num * PAGE_THUMB_SLOT
+                frame = self.thumb_canvas.create_rectangle(
+                    8, y + 6, PAGE_THUMB_WIDTH + 12, y + PAGE_THUMB_SLOT - 20,
+                    outline="white", fill="gray", tags="thumb_frame")
+                label = self.thumb_canvas.create_text(
+                    PAGE_THUMB_WIDTH / 2 + 10, y + PAGE_THUMB_SLOT - 10, text=str(page_num + 1), fill="white")
+                thumb = self.page_thumbs[page_num] = {"items": [frame, label], "frame": frame, "photo": None}
+            if thumb["photo"] is None and self.thumb_cache_dir:
+                path = os.path.join(self.thumb_cache_dir, f"{page_num}.png")
+                if os.path.exists(path):
+                    thumb["photo"] = tk.PhotoImage(file=path)
+                    y = page_num * PAGE_THUMB_SLOT
+                    thumb["items"].append(self.thumb_canvas.create_image(
+                        PAGE_THUMB_WIDTH / 2 + 10, y + 6, anchor=tk.N, image=thumb["photo"]))
+                elif page_num not in self.thumb_pending:
+                    missing.append(page_num)
+        
+        if missing:
+            self.thumb_pending.update(missing)
+            future = self.get_thumb_pool().submit(render_page_thumbnails, self.pdf_path, self.thumb_cache_dir, missing)
+            self.thumb_futures.append(("pages", self.pdf_path, future))
+            self.schedule_thumbnail_poll()
+        self.highlight_current_thumbnail()
+    
+    def highlight_current_thumbnail(self):
+        for page_num, thumb in self.page_thumbs.items():
+            color = "blue" if page_num == self.current_page else "white"
+            self.thumb_canvas.itemconfig(thumb["frame"], outline=color, width=3 if page_num == self.current_page else 1)
+    
+    def on_thumb_scroll(self, *args):
+        self.thumb_canvas.yview(*args)
+        self.schedule_thumbnail_update()
+    
+    def on_thumb_wheel(self, event):
+        self.thumb_canvas.yview_scroll(-1 * (event.delta // 120), "units")
+        self.schedule_thumbnail_update()
+        return "break"
+    
+    def on_thumbnail_click(self, event):
+        page_num = int(self.thumb_canvas.canvasy(event.y) // PAGE_THUMB_SLOT)
+        self.go_to_page(page_num)
+    
+    def adjust_zoom(self, factor):
+        self.zoom_level *= factor
+        self.zoom_level = max(0.5, min(3.0, self.zoom_level))
+        self.schedule_render()
+    
+    def reset_zoom(self):
+        self.zoom_level = 1.0
+        self.display_page()
+    
+    def on_canvas_resize(self, event):
+        if self.page_size:
+            self.schedule_relayout()
+    
+    def on_mouse_wheel(self, event):
+        if event.state & 0x4:  # Control key pressed
+            factor = 1.1 if event.delta > 0 else 0.9
+            self.adjust_zoom(factor)
+            return "break"
+        else:
+            if self.continuous_var.get() and self.continuous_tops:
+                # Desplazamiento continuo: sin saltos de página ni redibujado completo
+                self.canvas.yview_scroll(-1 * (event.delta // 120), "units")
+                self.focus_visible_page()
+                self.schedule_view_update()
+            elif self.page_size:
+                canvas_height = self.canvas.winfo_height()
+                page_height = self.page_size[1]
+                if page_height <= canvas_height:
+                    if event.delta < 0 and self.current_page < self.total_pages - 1:
+                        self.next_page()
+                    elif event.delta > 0 and self.current_page > 0:
+                        self.prev_page()
+                else:
+                    self.canvas.yview_scroll(-1 * (event.delta // 120), "units")
+                    self.schedule_view_update()
+                    yview = self.canvas.yview()
+                    if yview[1] == 1.0 and event.delta < 0 and self.current_page < self.total_pages - 1:
+                        self.next_page()
+                    elif yview[0] == 0.0 and event.delta > 0 and self.current_page > 0:
+                        self.prev_page()
+            return "break"
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
+    
+    timer = StartupTimer()
+    root = tk.Tk()
+    root.withdraw()
+    splash = SplashScreen(tk.Toplevel(root), LOGO_PATH)
+    timer.mark("splash")
+    
+    # Importaciones pesadas y biblioteca de firmas en segundo plano mientras se ve el splash
+    preload = {}
+    
+    def preload_editor():
+        try:
+            load_dependencies()
+            timer.mark("imports")
+            # Conexión propia del hilo: el editor abre la suya en el hilo de Tk
+            engine = SigningEngine()
+            preload["library"] = engine.load_library()
+            engine.get_store().close()
+            timer.mark("library")
+        except Exception as e:
+            preload["error"] = e
+        preload["done"] = True
+    
+    def show_editor_when_ready():
+        if not preload.get("done"):
+            root.after(20, show_editor_when_ready)
+            return
+        if "error" in preload:
+            print(f"Error al preparar el editor: {preload['error']}")
+        app = PDFEditor(root, preload.get("library"))
+        timer.mark("editor")
+        splash.close_splash()
+        root.deiconify()
+        
+        def on_interactive():
+            timer.mark("interactive")
+            timer.report()
+        root.after_idle(on_interactive)
+    
+    threading.Thread(target=preload_editor, daemon=True).start()
+    root.after(20, show_editor_when_ready)
+    root.mainloop()
+
     
\ No newline at end of file
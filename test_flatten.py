@@ -0,0 +1,84 @@
+import os
+import io
+import tempfile
+import unittest
+
+import final
+from final import fitz, Image
+
+# Aplanado: las páginas sin firma y lo que las apunta (enlaces, índice, formularios) no cambian
+
+
+def make_form_pdf(path):
+    doc = fitz.open()
+    for page_num in range(4):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Página {page_num + 1}")
+    doc[0].insert_link({"kind": fitz.LINK_GOTO, "from": fitz.Rect(72, 100, 200, 120), "page": 2,
+                        "to": fitz.Point(0, 0)})
+    doc.set_toc([[1, "Inicio", 1], [1, "Anexo", 3]])
+    for page_num, name in ((0, "nombre"), (2, "fecha")):
+        widget = fitz.Widget()
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_name = name
+        widget.field_value = name.upper()
+        widget.rect = fitz.Rect(72, 300, 250, 320)
+        doc[page_num].add_widget(widget)
+    # Las páginas comparten /Resources, como en muchos PDF generados
+    resources = doc.xref_get_key(doc[0].xref, "Resources")[1]
+    for page in doc:
+        doc.xref_set_key(page.xref, "Resources", resources)
+    doc.save(path)
+    doc.close()
+
+
+def signature_png():
+    image = Image.new("RGBA", (300, 100), (0, 0, 0, 0))
+    image.paste((0, 0, 128, 255), (10, 10, 290, 90))
+    img_buffer = io.BytesIO()
+    image.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+
+class FlattenTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix="adobo_test_")
+        self.input_path = os.path.join(self.work_dir.name, "formulario.pdf")
+        self.output_path = os.path.join(self.work_dir.name, "aplanado.pdf")
+        make_form_pdf(self.input_path)
+        self.images = {"firma": signature_png()}
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def flatten_page_3(self, workers, max_pages):
+        placements = {2: [((100, 100, 250, 150), "firma")]}
+        final.export_pdf(self.input_path, self.output_path, placements, self.images, flatten=True,
+                         workers=workers, max_pages=max_pages)
+        return fitz.open(self.output_path)
+
+    def check_output(self, doc):
+        self.assertEqual(len(doc), 4)
+        self.assertEqual([(link["kind"], link["page"]) for link in doc[0].get_links()], [(fitz.LINK_GOTO, 2)])
+        self.assertEqual(doc.get_toc(), [[1, "Inicio", 1], [1, "Anexo", 3]])
+        # El campo de la página aplanada queda pintado y sale de /AcroForm; el otro sigue vivo
+        self.assertEqual([widget.field_name for page in doc for widget in page.widgets()], ["nombre"])
+        fields = doc.xref_get_key(doc.pdf_catalog(), "AcroForm/Fields")[1]
+        self.assertEqual(fields.count(" 0 R"), 1)
+        self.assertEqual(doc[2].get_text().strip(), "")
+        self.assertEqual([len(page.get_images()) for page in doc], [0, 0, 1, 0])
+        self.assertIn("Página 1", doc[0].get_text())
+        with open(self.output_path, "rb") as f:
+            self.assertEqual(f.read().count(b"%%EOF"), 1)
+
+    def test_single_process(self):
+        with self.flatten_page_3(workers=1, max_pages=32) as doc:
+            self.check_output(doc)
+
+    def test_pool_and_segments(self):
+        with self.flatten_page_3(workers=2, max_pages=1) as doc:
+            self.check_output(doc)
+
+
+if __name__ == "__main__":
+    unittest.main()
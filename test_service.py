@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import base64
+import signal
+import tempfile
+import threading
+import unittest
+import http.client
+import urllib.error
+import urllib.request
+
+import final
+from final import fitz, Image
+
+# Prueba del servicio HTTP de firma contra localhost: firma correcta, errores del cliente,
+# rechazo por saturación, recuperación tras la caída de un proceso y contadores
+
+
+def make_pdf(pages=3):
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f"Página {page_num + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class SigningServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.TemporaryDirectory(prefix="adobo_test_")
+        signatures_dir = os.path.join(cls.work_dir.name, "signatures")
+        library_path = os.path.join(cls.work_dir.name, "signatures.db")
+        os.makedirs(signatures_dir)
+        scan_path = os.path.join(cls.work_dir.name, "firma.png")
+        scan = Image.new("RGB", (400, 160), "white")
+        scan.paste((20, 30, 120), (60, 60, 340, 100))
+        scan.save(scan_path)
+        engine = final.SigningEngine(library_path, signatures_dir)
+        cls.signature, _ = engine.import_signature(scan_path)
+        engine.get_store().close()
+
+        cls.service = final.SigningService(1, 0, library_path, signatures_dir)
+        cls.server = final.create_signing_server(cls.service, "127.0.0.1", 0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.pdf = base64.b64encode(make_pdf()).decode("ascii")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+        cls.work_dir.cleanup()
+
+    def request(self, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data, {"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            with e:
+                return e.code, dict(e.headers), e.read()
+
+    def sign(self, placements, pdf=None):
+        return self.request("/sign", {"pdf": pdf or self.pdf, "placements": placements})
+
+    def test_sign_returns_pdf(self):
+        status, headers, body = self.sign([
+            {"signature": self.signature, "page": 1, "x": 100, "y": 100, "width": 120},
+            {"signature": self.signature, "page": 3, "rect": [50, 700, 200, 760]}
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], "application/pdf")
+        self.assertEqual(headers["X-Adobo-Placements"], "2")
+        doc = fitz.open(stream=body, filetype="pdf")
+        self.assertEqual(len(doc), 3)
+        self.assertTrue(doc[0].get_images())
+        self.assertFalse(doc[1].get_images())
+        doc.close()
+
+    def test_client_errors_are_400(self):
+        cases = [
+            [{"signature": self.signature, "x": 10, "y": 10}],
+            [{"signature": self.signature, "page": 99, "x": 10, "y": 10}],
+            [5],
+            [{"signature": self.signature, "page": 1, "rect": [10, 10, 5]}],
+            []
+        ]
+        for placements in cases:
+            status, _, body = self.sign(placements)
+            self.assertEqual(status, 400, placements)
+            self.assertIn("error", json.loads(body))
+        status, _, body = self.sign([{"signature": self.signature, "page": 1, "x": 10, "y": 10}],
+                                    base64.b64encode(b"no es un PDF").decode("ascii"))
+        self.assertEqual(status, 400)
+        self.assertNotIn("adobo_service_", json.loads(body)["error"])
+
+    def test_invalid_content_length_is_400(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        try:
+            connection.putrequest("POST", "/sign")
+            connection.putheader("Content-Length", "abc")
+            connection.endheaders()
+            response = connection.getresponse()
+            self.assertEqual(response.status, 400)
+            self.assertIn("error", json.loads(response.read()))
+        finally:
+            connection.close()
+
+    @unittest.skipUnless(hasattr(signal, "SIGKILL"), "necesita SIGKILL")
+    def test_pool_recovers_after_worker_crash(self):
+        placements = [{"signature": self.signature, "page": 1, "x": 10, "y": 10}]
+        self.assertEqual(self.sign(placements)[0], 200)
+        restarts = self.service.stats()["pool_restarts"]
+        for process in list(self.service.pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        # La primera petición tras la caída puede recibir 503; el pool se sustituye y la siguiente firma
+        deadline = time.monotonic() + 30
+        statuses = []
+        while time.monotonic() < deadline:
+            statuses.append(self.sign(placements)[0])
+            if statuses[-1] == 200:
+                break
+        self.assertEqual(statuses[-1], 200, statuses)
+        self.assertTrue(set(statuses) <= {200, 503}, statuses)
+        self.assertEqual(self.service.stats()["pool_restarts"], restarts + 1)
+
+    def test_unknown_signature_is_404(self):
+        status, _, _ = self.sign([{"signature": "no-existe.png", "page": 1, "x": 10, "y": 10}])
+        self.assertEqual(status, 404)
+
+    def test_busy_service_returns_429(self):
+        # Un proceso sin cola: con la única plaza ocupada la siguiente petición se rechaza
+        self.assertTrue(self.service.slots.acquire(blocking=False))
+        try:
+            status, headers, _ = self.sign([{"signature": self.signature, "page": 1, "x": 10, "y": 10}])
+        finally:
+            self.service.slots.release()
+        self.assertEqual(status, 429)
+        self.assertEqual(headers["Retry-After"], "1")
+
+    def test_stats(self):
+        self.sign([{"signature": self.signature, "page": 2, "x": 10, "y": 10}])
+        status, _, body = self.request("/stats")
+        self.assertEqual(status, 200)
+        stats = json.loads(body)
+        self.assertGreaterEqual(stats["ok"], 1)
+        self.assertGreaterEqual(stats["placements"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["workers"], 1)
+        self.assertIn("p95", stats["latency_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import io
+import tempfile
+import unittest
+
+import final
+from final import Image
+
+# Importación de firmas: recorte a la tinta y copia incrustable sin fondo semitransparente
+
+
+def make_scan(path):
+    # Trazos oscuros sobre fondo claro, con márgenes amplios como un escaneo real
+    scan = Image.new("RGB", (1200, 500), (250, 250, 245))
+    for i in range(12):
+        for step in range(40):
+            x = 400 + i * 30 + step
+            y = 200 + step * 3
+            scan.paste((20, 30, 110 + i * 8), (x, y, x + 5, y + 5))
+    scan.save(path)
+
+
+class SignatureImportTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix="adobo_test_")
+        self.scan_path = os.path.join(self.work_dir.name, "firma.png")
+        make_scan(self.scan_path)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def import_signature(self, colors, feather=1.5):
+        library_dir = os.path.join(self.work_dir.name, f"biblioteca_{colors}")
+        os.makedirs(library_dir)
+        engine = final.SigningEngine(os.path.join(library_dir, "signatures.db"), library_dir)
+        try:
+            name, image = engine.import_signature(self.scan_path, feather=feather, colors=colors)
+            data, size = engine.get_signature(name)
+        finally:
+            engine.get_store().close()
+        return image, data, size
+
+    def test_crops_to_ink(self):
+        image, _, size = self.import_signature(0)
+        self.assertLess(image.width, 600)
+        self.assertLess(image.height, 200)
+        self.assertEqual(size, image.size)
+
+    def test_background_stays_transparent(self):
+        for colors in (0, 1, 2, 4, 16, 256):
+            image, data, size = self.import_signature(colors)
+            with Image.open(io.BytesIO(data)) as blob:
+                self.assertEqual(blob.size, size)
+                embedded = blob.convert("RGBA")
+            pairs = list(zip(image.getchannel("A").tobytes(), embedded.getchannel("A").tobytes()))
+            self.assertEqual({out for source, out in pairs if source == 0}, {0}, colors)
+            if colors == 0:
+                self.assertTrue(all(source == out for source, out in pairs))
+            else:
+                # Con paleta la tinta es opaca a partir de la mitad del alfa
+                self.assertEqual({out for source, out in pairs if source >= 128}, {255}, colors)
+
+if __name__ == "__main__":
+    unittest.main()